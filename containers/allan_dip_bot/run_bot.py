@@ -21,6 +21,8 @@ from baseline_bots.bots.smart_order_accepter_bot import (
     SmartOrderAccepterBot,
 )
 from baseline_bots.bots.transparent_bot import TransparentBot
+from baseline_bots.game_updates import wait_until
+from baseline_bots.log_shipper import IntentLogShipper
 
 POWERS = ["AUSTRIA", "ENGLAND", "FRANCE", "GERMANY", "ITALY", "RUSSIA", "TURKEY"]
 BOTS = [
@@ -39,13 +41,8 @@ async def launch() -> None:
     Waits for dipnet model to load
     """
 
-    print("Waiting for TensorFlow server to come online", end=" ")
-    serving_flag = False
-    while not serving_flag:
-        serving_flag = is_port_opened(9501)
-        print("", end=".")
-        await asyncio.sleep(1)
-    print()
+    print("Waiting for TensorFlow server to come online")
+    await wait_until(lambda: is_port_opened(9501))
     print("TensorFlow server online")
 
 
@@ -65,6 +62,8 @@ async def play(
     friendly_coef: float,
     unrealized_coef: float,
     aggressiveness: Optional[Aggressiveness] = Aggressiveness.moderate,
+    anytime_mode: bool = False,
+    log_spill_file: Optional[str] = None,
 ) -> None:
     """
     Launches the bot for game play
@@ -75,6 +74,8 @@ async def play(
     :param power_name: power name of the bot to be launched
     :param bot_class: the type of bot to be launched - NoPressDipBot/TransparentBot/SmartOrderAccepterBot/..
     :param sleep_delay: bool to indicate if bot should sleep randomly for 1-3s before execution
+    :param anytime_mode: bool to indicate if SmartOrderAccepterBot should sample rollouts until its time budget runs out
+    :param log_spill_file: file to which intent logs that cannot be sent are written (dropped if `None`)
     """
     await launch()
 
@@ -109,16 +110,17 @@ async def play(
             friendly_coef=friendly_coef,
             unrealized_coef=unrealized_coef,
             communication_stage_length=communication_stage_length,
+            anytime_mode=anytime_mode,
         )
     else:
         raise ValueError(f"{bot_class.__name__!r} is not a valid bot type")
 
+    # Send intent logs in the background instead of waiting on the server for each one
+    bot.log_shipper = IntentLogShipper(bot.send_log_data, spill_path=log_spill_file)
+
     # Wait while game is still being formed
-    print("Waiting for game to start", end=" ")
-    while game.is_game_forming:
-        await asyncio.sleep(2)
-        print("", end=".")
-    print()
+    print("Waiting for game to start")
+    await bot.game_updates.wait_until(lambda: not game.is_game_forming, max_delay=2)
 
     t1 = time.perf_counter()
 
@@ -141,13 +143,25 @@ async def play(
             # Always send orders so engine knows turn is over
             await bot.send_orders(orders_data)
 
+        # Deliver the phase's intent logs before the next phase starts
+        await bot.flush_intent_logs()
+
         phase_end_time = time.time()
         print(
             f"Time taken for phase {current_phase}: {phase_end_time - phase_start_time:0.4}s"
         )
 
-        while current_phase == game.get_current_phase():
-            await asyncio.sleep(2)
+        # Start the next phase as soon as the server notifies it
+        await bot.game_updates.wait_until(
+            lambda phase=current_phase: phase != game.get_current_phase(), max_delay=2
+        )
+
+    await bot.log_shipper.close()
+    if bot.log_shipper.dropped or bot.log_shipper.spilled:
+        print(
+            f"Intent log lines not sent: {bot.log_shipper.dropped} dropped, "
+            f"{bot.log_shipper.spilled} spilled to {log_spill_file!r}"
+        )
 
     t2 = time.perf_counter()
     print(f"Time taken for game: {t2-t1:0.4}")
@@ -246,6 +260,16 @@ def main() -> None:
         choices=[str(a.value) for a in Aggressiveness],
         help="aggressiveness of the bot, overrides individual coefficients (default: %(default)s)",
     )
+    parser.add_argument(
+        "--anytime_mode",
+        action="store_true",
+        help="make SmartOrderAccepterBot evaluate proposals with as many rollouts as the communication stage leaves time for",
+    )
+    parser.add_argument(
+        "--log_spill_file",
+        type=str,
+        help="file to which intent logs that cannot be sent to the server are written (default: dropped)",
+    )
     args = parser.parse_args()
     host: str = args.host
     port: int = args.port
@@ -264,6 +288,9 @@ def main() -> None:
     aggressiveness: Optional[Aggressiveness] = (
         Aggressiveness(args.aggressiveness) if args.aggressiveness else None
     )
+    anytime_mode: bool = args.anytime_mode
+
+    log_spill_file: Optional[str] = args.log_spill_file
 
     bot_class: Type[BaselineBot] = NAMES_TO_BOTS[bot_type]
 
@@ -284,6 +311,8 @@ def main() -> None:
             friendly_coef=friendly_coef,
             unrealized_coef=unrealized_coef,
             aggressiveness=aggressiveness,
+            anytime_mode=anytime_mode,
+            log_spill_file=log_spill_file,
         )
     )
 
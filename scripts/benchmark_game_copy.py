@@ -0,0 +1,84 @@
+"""Compare the cost of `deepcopy_game` and `snapshot_game` on early and late positions"""
+
+import argparse
+import random
+import time
+from typing import Callable, Tuple
+
+from diplomacy import Game
+
+from baseline_bots.utils import deepcopy_game, snapshot_game
+
+
+def play_random_phase(game: Game, rng: random.Random) -> None:
+    """Sets random valid orders for every power and processes the phase"""
+    possible_orders = game.get_all_possible_orders()
+    for power_name in game.powers:
+        orders = [
+            rng.choice(sorted(possible_orders[loc]))
+            for loc in game.get_orderable_locations(power_name)
+            if possible_orders[loc]
+        ]
+        game.set_orders(power_name, orders)
+    game.process()
+
+
+def time_copy(copy_fn: Callable[[Game], Game], game: Game, repeats: int) -> float:
+    """
+    :return: average time in milliseconds taken to copy the game
+    """
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        copy_fn(game)
+    return (time.perf_counter() - start_time) / repeats * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--late_year",
+        type=int,
+        default=1910,
+        help="year of the late-game position (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=10,
+        help="number of copies timed per position (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed for the random orders (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    late_year: int = args.late_year
+    repeats: int = args.repeats
+    seed: int = args.seed
+
+    rng = random.Random(seed)
+    game = Game()
+
+    def measure() -> Tuple[str, float, float]:
+        return (
+            game.get_current_phase(),
+            time_copy(deepcopy_game, game, repeats),
+            time_copy(snapshot_game, game, repeats),
+        )
+
+    results = {"early": measure()}
+    while not game.is_game_done and int(game.get_current_phase()[1:5]) < late_year:
+        play_random_phase(game, rng)
+    results["late"] = measure()
+
+    for label, (phase, deepcopy_ms, snapshot_ms) in results.items():
+        print(
+            f"{label} ({phase}): deepcopy_game {deepcopy_ms:0.2f}ms, "
+            f"snapshot_game {snapshot_ms:0.2f}ms ({deepcopy_ms / snapshot_ms:0.1f}x faster)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare sending a round of press messages one at a time and with `send_messages_batch`
+
+The server is stood in for by a bot whose deliveries wait for a simulated round trip.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from diplomacy import Game, Message
+
+from baseline_bots.bots.baseline_bot import BaselineBot
+from baseline_bots.utils import MessagesData
+
+
+class LatencyBot(BaselineBot):
+    """Bot whose message deliveries take a random server round trip instead of reaching a server"""
+
+    def __init__(
+        self, power_name: str, game: Game, latency: float, jitter: float
+    ) -> None:
+        super().__init__(power_name, game)
+        self.latency = latency
+        self.jitter = jitter
+        self.delivered: List[Message] = []
+
+    async def _deliver_message(self, msg_obj: Message) -> None:
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        self.delivered.append(msg_obj)
+
+    async def __call__(self) -> List[str]:
+        return []
+
+
+def build_round(game: Game, power_name: str, messages_per_power: int) -> MessagesData:
+    """
+    :return: messages like the ones sent by SmartOrderAccepterBot in a round (ALY proposals, FCTs and YES replies)
+    """
+    msg_data = MessagesData()
+    others = [other for other in game.powers if other != power_name]
+    for other in others:
+        vss = " ".join(power[:3] for power in others if power != other)
+        templates = [
+            f"PRP (ALY ({power_name[:3]} {other[:3]}) VSS ({vss}))",
+            f"FCT (XDO (({power_name[:3]} AMY PAR) MTO BUR))",
+            f"YES (PRP (XDO (({power_name[:3]} AMY MAR) HLD)))",
+        ]
+        for template in templates[:messages_per_power]:
+            msg_data.add_message(other, template)
+    return msg_data
+
+
+async def time_sends(
+    bot: LatencyBot, msg_data: MessagesData, batched: bool, max_in_flight: int
+) -> float:
+    """
+    :return: time in milliseconds taken to send the messages
+    """
+    start_time = time.perf_counter()
+    if batched:
+        await bot.send_messages_batch(msg_data, max_in_flight=max_in_flight)
+    else:
+        for msg in msg_data:
+            await bot.send_message(msg["recipient"], msg["message"], MessagesData())
+    return (time.perf_counter() - start_time) * 1000
+
+
+async def run(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    game = Game()
+    bot = LatencyBot("FRANCE", game, args.latency / 1000, args.jitter / 1000)
+    msg_data = build_round(game, bot.power_name, args.messages_per_power)
+
+    serial_ms = await time_sends(bot, msg_data, False, args.max_in_flight)
+    batched_ms = await time_sends(bot, msg_data, True, args.max_in_flight)
+    print(
+        f"{len(msg_data)} messages with {args.latency:0.0f}ms (+{args.jitter:0.0f}ms) round trips: "
+        f"one at a time {serial_ms:0.0f}ms, batched {batched_ms:0.0f}ms "
+        f"({serial_ms / batched_ms:0.1f}x faster)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=50,
+        help="minimum round trip time in milliseconds (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=20,
+        help="maximum random extra round trip time in milliseconds (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--messages_per_power",
+        type=int,
+        default=3,
+        choices=[1, 2, 3],
+        help="number of messages sent to each other power (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max_in_flight",
+        type=int,
+        default=8,
+        help="maximum number of messages sent at the same time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed for the simulated latencies (default: %(default)s)",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
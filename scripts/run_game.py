@@ -8,7 +8,7 @@ from typing import Any, Dict, List, Optional, Sequence
 from create_game import create_game
 from download_game import download_game
 
-from baseline_bots.utils import POWER_NAMES_DICT
+from baseline_bots.constants import POWER_NAMES_DICT
 
 REPO_DIR = Path(__file__).resolve().parent.parent
 
@@ -3,20 +3,41 @@
 
 from abc import ABC, abstractmethod
 import asyncio
-from typing import ClassVar, List, Sequence
+from collections import defaultdict
+from enum import Enum
+from typing import ClassVar, Dict, List, Optional, Sequence, Tuple
 
 from diplomacy import Game, Message
 from diplomacy.client.network_game import NetworkGame
 from diplomacy.utils import strings
 
+from baseline_bots.game_updates import GameUpdateWaiter
+from baseline_bots.log_shipper import IntentLogShipper
 from baseline_bots.utils import (
-    LIMITED_MESSAGE_GRAMMAR,
     USE_LIMITED_DAIDE,
     MessagesData,
     OrdersData,
+    get_grammar,
     is_valid_daide_message,
 )
 
+# Default number of messages `BaselineBot.send_messages_batch` sends at the same time
+MAX_MESSAGES_IN_FLIGHT = 8
+
+
+class SendOutcome(Enum):
+    """
+    Outcome of sending a message
+    """
+
+    sent = "sent"
+    # Invalid DAIDE syntax, or outside of the limited DAIDE syntax
+    invalid = "invalid"
+    # Already sent
+    duplicate = "duplicate"
+    # Rejected by the server or lost
+    failed = "failed"
+
 
 class BaselineBot(ABC):
     """Abstract Base Class for baselines bots"""
@@ -28,6 +49,15 @@ class BaselineBot(ABC):
     def __init__(self, power_name: str, game: Game) -> None:
         self.power_name = power_name
         self.game = game
+        # Incremental inbox state, reset whenever the phase changes
+        self.inbox_phase: Optional[str] = None
+        self.inbox_timestamp: Optional[int] = None
+        self.inbox: List[Message] = []
+        self.new_messages: List[Message] = []
+        # If set, intent logs are sent in the background instead of one at a time
+        self.log_shipper: Optional[IntentLogShipper] = None
+        # Wakes up waits on the game whenever the server notifies a change
+        self.game_updates = GameUpdateWaiter(game)
 
     @property
     def display_name(self) -> str:
@@ -37,8 +67,9 @@ class BaselineBot(ABC):
     async def wait_for_comm_stage(self) -> None:
         """Wait for all other press bots to be ready.
 
-        The bot marks itself as ready and then polls the other press bots until they are all ready.
-        Once they all, the bot can start communicating.
+        The bot marks itself as ready and then waits until the other press bots are all ready,
+        checking again on every game notification from the server.
+        Once they all are, the bot can start communicating.
         """
         # Comm status should not be sent in local games, only set
         if isinstance(self.game, NetworkGame):
@@ -50,20 +81,38 @@ class BaselineBot(ABC):
                 power_name=self.power_name, comm_status=strings.READY
             )
 
-        while not all(
-            power.comm_status == strings.READY
-            for power in self.game.powers.values()
-            if power.player_type == strings.PRESS_BOT and not power.is_eliminated()
-        ):
-            await asyncio.sleep(1)
+        await self.game_updates.wait_until(
+            lambda: all(
+                power.comm_status == strings.READY
+                for power in self.game.powers.values()
+                if power.player_type == strings.PRESS_BOT and not power.is_eliminated()
+            )
+        )
 
-    def read_messages(self) -> List[Message]:
-        """Retrieves all valid messages for the current phase sent to the bot.
-        :return: List of messages.
+    def update_inbox(self) -> List[Message]:
+        """Adds messages that arrived since the last update to the inbox.
+
+        Only messages newer than the inbox's high-water mark (the timestamp of the
+        latest message seen in the current phase) are fetched, logged and validated.
+
+        :return: List of newly arrived valid messages.
         """
+        current_phase = self.game.get_current_phase()
+        if current_phase != self.inbox_phase:
+            self.inbox_phase = current_phase
+            self.inbox_timestamp = None
+            self.inbox = []
+
+        timestamp_from = (
+            self.inbox_timestamp + 1 if self.inbox_timestamp is not None else None
+        )
         messages = self.game.filter_messages(
-            messages=self.game.messages, game_role=self.power_name
+            messages=self.game.messages,
+            game_role=self.power_name,
+            timestamp_from=timestamp_from,
         )
+        if messages:
+            self.inbox_timestamp = max(messages)
         received_messages = sorted(
             msg for msg in messages.values() if msg.sender != self.power_name
         )
@@ -77,8 +126,20 @@ class BaselineBot(ABC):
                 print(
                     f"!! {self.display_name} received a message with invalid DAIDE syntax: {msg.message!r}"
                 )
+        self.inbox.extend(valid_messages)
+        self.new_messages = valid_messages
         return valid_messages
 
+    def read_messages(self) -> List[Message]:
+        """Retrieves all valid messages for the current phase sent to the bot.
+
+        Messages that arrived since the previous call are also available in `new_messages`.
+
+        :return: List of messages.
+        """
+        self.update_inbox()
+        return list(self.inbox)
+
     async def send_message(
         self, recipient: str, message: str, msg_data: MessagesData
     ) -> None:
@@ -88,19 +149,31 @@ class BaselineBot(ABC):
         :param message: Message to be sent
         :param msg_data: MessagesData object containing set of all sent messages
         """
+        msg_obj, _ = self._prepare_message(recipient, message, msg_data)
+        if msg_obj is not None:
+            await self._deliver_message(msg_obj)
+            self._record_message(msg_obj, msg_data)
+
+    def _prepare_message(
+        self, recipient: str, message: str, msg_data: MessagesData
+    ) -> Tuple[Optional[Message], SendOutcome]:
+        """Validates a message and checks that it is not in `msg_data` already
+
+        :return: Message to deliver (`None` if it should not be sent) and the outcome so far
+        """
         if not is_valid_daide_message(message):
             print(
                 f"!! {self.display_name} attempted to send a message with invalid DAIDE syntax: {message!r}"
             )
-            return
+            return None, SendOutcome.invalid
 
         if USE_LIMITED_DAIDE and not is_valid_daide_message(
-            message, LIMITED_MESSAGE_GRAMMAR
+            message, get_grammar("LIMITED_MESSAGE_GRAMMAR")
         ):
             print(
                 f"!! {self.display_name} attempted a message outside of the limited DAIDE syntax: {message!r}"
             )
-            return
+            return None, SendOutcome.invalid
 
         msg_obj = Message(
             sender=self.power_name,
@@ -108,14 +181,24 @@ class BaselineBot(ABC):
             message=message,
             phase=self.game.get_current_phase(),
         )
-        message_already_exists = msg_data.add_message(
-            msg_obj.recipient, msg_obj.message, allow_duplicates=False
-        )
-        if message_already_exists:
-            return
+        if {"recipient": msg_obj.recipient, "message": msg_obj.message} in msg_data:
+            return None, SendOutcome.duplicate
+        return msg_obj, SendOutcome.sent
+
+    def _record_message(self, msg_obj: Message, msg_data: MessagesData) -> None:
+        """Records a delivered message in `msg_data`, so that it is not sent again
 
+        :param msg_obj: Delivered message
+        :param msg_data: MessagesData object containing set of all sent messages
+        """
+        msg_data.add_message(msg_obj.recipient, msg_obj.message, allow_duplicates=False)
         print(f"{self.display_name} sent message: {msg_obj}")
 
+    async def _deliver_message(self, msg_obj: Message) -> None:
+        """Delivers a validated message
+
+        :param msg_obj: Message to deliver
+        """
         # Messages should not be sent in local games, only stored
         if isinstance(self.game, NetworkGame):
             await self.game.send_game_message(message=msg_obj)
@@ -127,10 +210,77 @@ class BaselineBot(ABC):
 
         :param msg_data: MessagesData object containing messages to send
         """
-        for msg in msg_data.messages:
-            # A new `MessagesData` instance is used because we don't want
-            # to add duplicate messages to the passed-in instance
-            await self.send_message(msg["recipient"], msg["message"], MessagesData())
+        await self.send_messages_batch(msg_data)
+
+    async def send_messages_batch(
+        self,
+        msg_data: MessagesData,
+        sent_msg_data: Optional[MessagesData] = None,
+        max_in_flight: int = MAX_MESSAGES_IN_FLIGHT,
+    ) -> List[SendOutcome]:
+        """Send messages to the server, with several requests in flight at once
+
+        All messages are validated first. Messages to different recipients are then sent concurrently,
+        while messages to the same recipient are still sent in order.
+
+        :param msg_data: MessagesData object containing messages to send
+        :param sent_msg_data: MessagesData object containing set of all sent messages,
+            to which messages are added once delivered. If given, messages already in it
+            or repeated within the batch are not sent again.
+            If `None`, every valid message is sent, including repeated ones.
+        :param max_in_flight: maximum number of messages being sent at the same time
+        :return: outcome of sending each message, in the order of `msg_data`
+        """
+        deduplicate = sent_msg_data is not None
+        if sent_msg_data is None:
+            sent_msg_data = MessagesData()
+        outcomes: List[SendOutcome] = []
+        # Messages to deliver for each recipient, with their positions in `outcomes`
+        deliveries: Dict[str, List[Tuple[int, Message]]] = defaultdict(list)
+        # Messages are only recorded once delivered, so duplicates within the batch are tracked separately
+        batch_msg_data = MessagesData()
+        for msg in msg_data:
+            msg_obj, outcome = self._prepare_message(
+                msg["recipient"], msg["message"], sent_msg_data
+            )
+            if (
+                deduplicate
+                and msg_obj is not None
+                and batch_msg_data.add_message(
+                    msg_obj.recipient, msg_obj.message, allow_duplicates=False
+                )
+            ):
+                msg_obj, outcome = None, SendOutcome.duplicate
+            if msg_obj is not None:
+                deliveries[msg_obj.recipient].append((len(outcomes), msg_obj))
+            outcomes.append(outcome)
+
+        semaphore = asyncio.Semaphore(max_in_flight)
+
+        async def deliver_in_order(
+            recipient_deliveries: List[Tuple[int, Message]]
+        ) -> None:
+            for index, msg_obj in recipient_deliveries:
+                try:
+                    async with semaphore:
+                        await self._deliver_message(msg_obj)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(
+                        f"!! {self.display_name} failed to send message {msg_obj}: {type(e).__name__}: {e}"
+                    )
+                    outcomes[index] = SendOutcome.failed
+                else:
+                    self._record_message(msg_obj, sent_msg_data)
+
+        await asyncio.gather(
+            *(
+                deliver_in_order(recipient_deliveries)
+                for recipient_deliveries in deliveries.values()
+            )
+        )
+        return outcomes
 
     async def send_intent_log(self, log_msg: str) -> None:
         """Send intent log asynchronously to the server
@@ -141,9 +291,24 @@ class BaselineBot(ABC):
         # Intent logging should not be sent in local games
         if not isinstance(self.game, NetworkGame):
             return
-        log_data = self.game.new_log_data(body=log_msg)
+        if self.log_shipper is not None:
+            self.log_shipper.submit(log_msg)
+        else:
+            await self.send_log_data(log_msg)
+
+    async def send_log_data(self, body: str) -> None:
+        """Send a log entry to the server and wait for it to be received
+
+        :param body: Log entry to be sent
+        """
+        log_data = self.game.new_log_data(body=body)
         await self.game.send_log_data(log=log_data)
 
+    async def flush_intent_logs(self) -> None:
+        """Send the intent logs still waiting in `log_shipper`"""
+        if self.log_shipper is not None:
+            await self.log_shipper.flush()
+
     async def send_orders(self, orders: Sequence[str], wait: bool = False) -> None:
         """Send orders asynchronously to the server
 
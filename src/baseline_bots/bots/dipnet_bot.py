@@ -2,7 +2,8 @@
 
 
 from abc import ABC
-from typing import List, Optional, Tuple
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from diplomacy import Game
 from diplomacy_research.players.benchmark_player import DipNetRLPlayer, DipNetSLPlayer
@@ -47,6 +48,45 @@ class DipnetBot(BaselineMsgRoundBot, ABC):
             power_name = self.power_name
         return await self.brain.get_beam_orders(game, power_name)
 
+    async def get_brain_orders_all_powers(
+        self, game: Optional[Game] = None, powers: Optional[Iterable[str]] = None
+    ) -> Dict[str, List[str]]:
+        """Gets DipNet orders for several powers in a single request
+
+        :param game: game state to get orders for. Defaults to the bot's game.
+        :param powers: powers to get orders for. Defaults to all powers on the map.
+        :return: dictionary of power name -> orders
+        """
+        if game is None:
+            game = self.game
+        if powers is None:
+            powers = game.map.powers
+        powers = list(powers)
+        if not powers:
+            return {}
+        # Passing a list of powers makes the brain return a list of orders per power
+        orders = await self.brain.get_orders(game, powers)
+        return dict(zip(powers, orders))
+
+    async def get_brain_beam_orders_all_powers(
+        self, game: Optional[Game] = None, powers: Optional[Iterable[str]] = None
+    ) -> Dict[str, Tuple[List[List[str]], List[float]]]:
+        """Gets DipNet beam orders for several powers concurrently
+
+        :param game: game state to get orders for. Defaults to the bot's game.
+        :param powers: powers to get orders for. Defaults to all powers on the map.
+        :return: dictionary of power name -> (beam orders, beam probabilities)
+        """
+        if game is None:
+            game = self.game
+        if powers is None:
+            powers = game.map.powers
+        powers = list(powers)
+        beams = await asyncio.gather(
+            *(self.get_brain_beam_orders(game, power) for power in powers)
+        )
+        return dict(zip(powers, beams))
+
     async def gen_orders(self) -> List[str]:
         """finalizes moves"""
         return await self.get_brain_orders()
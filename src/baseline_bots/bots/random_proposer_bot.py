@@ -6,7 +6,13 @@ from diplomacy import Game
 
 from baseline_bots.bots.baseline_bot import BaselineBot
 from baseline_bots.parsing_utils import dipnet_to_daide_parsing
-from baseline_bots.utils import MessagesData, get_other_powers, optional_AND
+from baseline_bots.utils import (
+    MessagesData,
+    get_all_possible_orders,
+    get_orderable_locations,
+    get_other_powers,
+    optional_AND,
+)
 
 
 class RandomProposerBot(BaselineBot):
@@ -24,13 +30,13 @@ class RandomProposerBot(BaselineBot):
         if self.game.get_current_phase()[-1] != "M":
             return ret_obj
         # Getting the list of possible orders for all locations
-        possible_orders = self.game.get_all_possible_orders()
+        possible_orders = get_all_possible_orders(self.game)
 
         # For each power, randomly sample a valid order
         for other_power in get_other_powers([self.power_name], self.game):
             suggested_random_orders = [
                 random.choice(possible_orders[loc])
-                for loc in self.game.get_orderable_locations(other_power)
+                for loc in get_orderable_locations(self.game, other_power)
                 if possible_orders[loc]
             ]
             suggested_random_orders = list(
@@ -49,10 +55,10 @@ class RandomProposerBot(BaselineBot):
         return ret_obj
 
     async def gen_orders(self) -> List[str]:
-        possible_orders = self.game.get_all_possible_orders()
+        possible_orders = get_all_possible_orders(self.game)
         orders = [
             random.choice([ord for ord in possible_orders[loc]])
-            for loc in self.game.get_orderable_locations(self.power_name)
+            for loc in get_orderable_locations(self.game, self.power_name)
             if possible_orders[loc]
         ]
         return orders
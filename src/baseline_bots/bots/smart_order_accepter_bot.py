@@ -31,17 +31,22 @@ from baseline_bots.parsing_utils import (
     dipnetify_unit,
     parse_proposal_messages,
 )
+from baseline_bots.province_graph import get_map_graph
 from baseline_bots.randomize_order import random_list_orders
 from baseline_bots.utils import (
     DEBUG_MODE,
     USE_LIMITED_DAIDE,
+    GameForker,
     MessagesData,
     OrdersData,
+    RolloutCache,
     get_best_orders,
-    get_order_tokens,
+    get_orderable_locations,
+    get_support_index,
     neighboring_opps,
     optional_AND,
     parse_daide,
+    parse_order,
     smart_select_support_proposals,
 )
 
@@ -84,6 +89,7 @@ class SmartOrderAccepterBot(DipnetBot):
         aggressiveness: Optional[Aggressiveness] = Aggressiveness.moderate,
         num_message_rounds: Optional[int] = None,
         communication_stage_length: int = 300,  # 5 minutes
+        anytime_mode: bool = False,
     ) -> None:
         """
         :param power_name: The name of the power
@@ -92,6 +98,7 @@ class SmartOrderAccepterBot(DipnetBot):
         :param test_mode: indicates if this bot is to be executed in test mode or not. In test_mode, async function `send_message` will not be used.
         :param stance_type: indicates if this bot should use ActionBasedStance (A) or ScoreBasedStance (S)
         :param aggressiveness: indicates if this bot should be aggressive (A), moderate (M) or friendly (F). Valid only if stance type is action-based
+        :param anytime_mode: indicates if proposals should be evaluated with as many rollouts as the communication stage leaves time for
         """
         super().__init__(power_name, game)
         self.alliance_props_sent = False
@@ -181,6 +188,21 @@ class SmartOrderAccepterBot(DipnetBot):
         self.peace_prps = defaultdict(list)
         self.rollout_length = 1
         self.rollout_n_order = 10
+        # Limit on proposals simulated at once by `get_best_orders` (`None` for no limit)
+        self.max_concurrent_rollouts: Optional[int] = None
+        # Maximum rollouts per proposal in `get_best_orders`
+        self.rollout_n_samples = 1
+        # In anytime mode, `get_best_orders` keeps sampling rollouts until a deadline
+        # derived from the remaining communication time instead of stopping at `rollout_n_samples`
+        self.anytime_mode = anytime_mode
+        # Share of the remaining communication time a single proposal evaluation may use
+        self.anytime_budget_fraction = 0.5
+        # Event loop time when the current communication stage ends (`None` outside of it)
+        self.comm_deadline: Optional[float] = None
+        # Rollout values already computed in the current phase
+        self.rollout_cache = RolloutCache()
+        # Base copy of the game that proposal simulations are forked from, rebuilt when the position changes
+        self.game_forker: Optional[GameForker] = None
         self.allies_influence = set()
         self.orders = None
         self.my_influence = set()
@@ -194,6 +216,12 @@ class SmartOrderAccepterBot(DipnetBot):
         self.foes = []
         self.neutral = []
         self.is_filtering_moves = True
+        # Inputs and outcome of the last proposal evaluation,
+        # used to skip re-evaluating when nothing changed between rounds
+        self.last_round_fingerprint: Optional[Tuple] = None
+        self.last_best_proposal: Optional[Tuple[str, List[str]]] = None
+        # Orders last reported in the intent log during the current phase
+        self.last_used_orders: Optional[OrdersData] = None
 
     async def log_stance_change(self, stance_log) -> None:
         for pw in self.opponents:
@@ -217,10 +245,7 @@ class SmartOrderAccepterBot(DipnetBot):
             orders_decided = FCT(optional_AND(orders))
             for pow in self.allies:
                 # Only send one FCT per recipient per phase
-                if any(
-                    msg["recipient"] == pow and msg["message"].startswith("FCT")
-                    for msg in msgs_data
-                ):
+                if msgs_data.has_message(pow, "FCT"):
                     continue
                 if pow != self.power_name:
                     await self.send_message(pow, str(orders_decided), msgs_data)
@@ -380,68 +405,39 @@ class SmartOrderAccepterBot(DipnetBot):
 
         await self.update_allies_and_foes()
 
-    def is_support_for_selected_orders(self, support_order: str) -> bool:
-        """
-        Determine if selected support order for neighbour corresponds to a self order selected
-
-        :param support_order: the support order to be determined for correspondence with self orders
-        :return: boolean indicating the detail mentioned above
-        """
-        order_tokens = get_order_tokens(support_order)
-
-        # Fetch our order for which the support order is determined using supported province name
-        selected_order = get_order_tokens(
-            self.orders.orders[order_tokens[2].split()[1]]
-        )
-
-        # Check if the support order is in correspondence with the order we have selected for our province
-        if (
-            len(order_tokens[2:]) == len(selected_order)
-            and order_tokens[2:] == selected_order
-        ):
-            # Attack move
-            return True
-        elif selected_order[1].strip() == "H" and (
-            len(order_tokens[2:]) == len(selected_order) - 1
-        ):
-            # Hold move
-            return True
-        return False
-
     def get_2_neigh_provinces(self) -> Set[str]:
         """
         Determine set of orderable locations of allies which are 1-hop/2-hops away from the current power's orderable locations
 
         :return: set of orderable locations of neighbouring allies
         """
-        provs = [
-            loc.upper() for loc in self.game.get_orderable_locations(self.power_name)
-        ]
+        graph = get_map_graph(self.game.map)
+        one_hop = graph.neighborhoods()
+        province_of = graph.province_of
+        provs = {
+            loc.upper() for loc in get_orderable_locations(self.game, self.power_name)
+        }
 
         # Agent's 1-neighbourhood provinces
-        n_provs = set()
-        for prov in provs:
-            n_provs.update(
-                prov2.upper()
-                for prov2 in self.game.map.abut_list(prov)
-                if prov2.upper().split("/")[0] not in provs
-                and prov2.upper().split("/")[0] in self.allies_influence
-            )
+        n_provs = {
+            loc
+            for loc in set().union(*(one_hop[prov] for prov in provs))
+            if province_of[loc] not in provs
+            and province_of[loc] in self.allies_influence
+        }
 
         # Agent's alliances provinces set:
         allies_provs = self.get_allies_orderable_locs()
 
         # Agent's 2-neighbourhood provinces (retained only alliance's provinces)
-        n2n_provs = set()
-        for prov in n_provs:
-            if prov in allies_provs:
-                n2n_provs.update(
-                    prov2.upper()
-                    for prov2 in self.game.map.abut_list(prov)
-                    if prov2.upper().split("/")[0] not in provs
-                    and prov2.upper().split("/")[0] not in n_provs
-                    and prov2.upper().split("/")[0] in self.allies_influence
-                )
+        n2n_provs = {
+            loc
+            for prov in n_provs & allies_provs
+            for loc in one_hop[prov]
+            if province_of[loc] not in provs
+            and province_of[loc] not in n_provs
+            and province_of[loc] in self.allies_influence
+        }
         n2n_provs.update(n_provs)
         return n2n_provs
 
@@ -452,15 +448,15 @@ class SmartOrderAccepterBot(DipnetBot):
         :param order: the order representing the move which is to be determined if it is bad or not
         :return: boolean indicating the above detail
         """
-        order_tokens = get_order_tokens(order)
+        parsed_order = parse_order(order)
 
-        if len(order_tokens) == 2:
+        if len(parsed_order.tokens) == 2:
             # Attack move
-            if order_tokens[1].split()[-1] in self.my_influence:
+            if parsed_order.destination in self.my_influence:
                 return True
-        elif len(order_tokens) == 4 and order_tokens[1] == "S":
+        elif len(parsed_order.tokens) == 4 and parsed_order.verb == "S":
             # Support move
-            if order_tokens[3].split()[-1] in self.my_influence:
+            if parsed_order.destination in self.my_influence:
                 return True
 
         return False
@@ -494,10 +490,10 @@ class SmartOrderAccepterBot(DipnetBot):
 
         :param order: the order which is to be determined if it is a support move or not
         """
-        order_tokens = get_order_tokens(order)
+        parsed_order = parse_order(order)
         return (
-            3 <= len(order_tokens) <= 4
-            and order_tokens[1] == "S"
+            3 <= len(parsed_order.tokens) <= 4
+            and parsed_order.verb == "S"
             and not self.bad_move(order)
         )
 
@@ -515,7 +511,9 @@ class SmartOrderAccepterBot(DipnetBot):
         """
         provinces = set()
         for ally in [pow1 for pow1 in self.opponents if pow1 in self.allies]:
-            new_provs = {loc.upper() for loc in self.game.get_orderable_locations(ally)}
+            new_provs = {
+                loc.upper() for loc in get_orderable_locations(self.game, ally)
+            }
             provinces.update(new_provs)
         return provinces
 
@@ -528,7 +526,6 @@ class SmartOrderAccepterBot(DipnetBot):
         :param comms_obj: MessagesData object
         :return: Dictionary of recipient - support proposals message
         """
-        self.possible_orders = self.game.get_all_possible_orders()
         self.cache_allies_influence()
         self.my_influence = set(self.game.get_power(self.power_name).influence)
         final_messages = defaultdict(list)
@@ -537,32 +534,38 @@ class SmartOrderAccepterBot(DipnetBot):
             # Fetch neighbour's orderable provinces
             n2n_provs = self.get_2_neigh_provinces()
 
+            # Support orders of all units, indexed by the move or unit they support
+            support_index = get_support_index(self.game)
+
             possible_support_proposals = defaultdict(list)
 
-            for n2n_p in n2n_provs:
-                if not (self.possible_orders[n2n_p]):
+            for selected_order in self.orders.orders.values():
+                if not selected_order:
                     continue
+                parsed_selected_order = parse_order(selected_order)
 
-                # Filter out support orders from list of all possible orders
-                subset_possible_orders = [
-                    ord for ord in self.possible_orders[n2n_p] if self.support_move(ord)
-                ]
-                for order in subset_possible_orders:
-                    order_tokens = get_order_tokens(order)
-                    if order_tokens[2].split()[
-                        1
-                    ] in self.orders.orders and self.is_support_for_selected_orders(
-                        order
-                    ):
-                        # If this support move corresponds to one of the orders the current bot has selected, exec following
-
-                        # Use neighbour's unit to keep track of multiple support orders possible
-                        location_comb = order_tokens[0].split()[1]
-
-                        # Add to list of possible support proposals for this location combination
-                        possible_support_proposals[location_comb].append(
-                            (order_tokens[0], " ".join(order_tokens[2:]), order)
+                # Support holds only name the supported unit
+                if parsed_selected_order.verb == "H":
+                    supported_order = parsed_selected_order.unit
+                else:
+                    supported_order = " ".join(parsed_selected_order.tokens)
+
+                for n2n_p, order in support_index.get(supported_order, []):
+                    if n2n_p not in n2n_provs or self.bad_move(order):
+                        continue
+                    parsed_order = parse_order(order)
+
+                    # Use neighbour's unit to keep track of multiple support orders possible
+                    location_comb = parsed_order.location
+
+                    # Add to list of possible support proposals for this location combination
+                    possible_support_proposals[location_comb].append(
+                        (
+                            parsed_order.unit,
+                            " ".join(parsed_order.tokens[2:]),
+                            order,
                         )
+                    )
 
             possible_support_proposals = smart_select_support_proposals(
                 possible_support_proposals
@@ -739,10 +742,7 @@ class SmartOrderAccepterBot(DipnetBot):
                 )
             for foe in self.foes:
                 # Only send one FCT per recipient per phase
-                if any(
-                    msg["recipient"] == foe and msg["message"].startswith("FCT")
-                    for msg in msgs_data
-                ):
+                if msgs_data.has_message(foe, "FCT"):
                     continue
                 await self.send_message(foe, str(daide_orders), msgs_data)
         except asyncio.CancelledError:
@@ -754,6 +754,43 @@ class SmartOrderAccepterBot(DipnetBot):
             if DEBUG_MODE:
                 raise e
 
+    def get_round_fingerprint(
+        self,
+        valid_proposal_orders: Dict[str, List[str]],
+        shared_orders: Dict[str, List[str]],
+        power_stance: Dict[str, float],
+    ) -> Tuple:
+        """
+        Build a hashable summary of the inputs used to pick the best proposal
+
+        :param valid_proposal_orders: dictionary of proposer -> proposed orders (including our own orders)
+        :param shared_orders: dictionary of power -> orders the power said it would execute
+        :param power_stance: our stance towards each other power
+        :return: fingerprint which changes whenever any of the inputs change
+        """
+        return (
+            self.game.get_current_phase(),
+            tuple(
+                sorted(
+                    (pow, tuple(ords)) for pow, ords in valid_proposal_orders.items()
+                )
+            ),
+            tuple(sorted((pow, tuple(ords)) for pow, ords in shared_orders.items())),
+            tuple(sorted(power_stance.items())),
+            tuple(self.allies),
+        )
+
+    def get_rollout_deadline(self) -> Optional[float]:
+        """
+        :return: event loop time by which `get_best_orders` should return in anytime mode,
+            or `None` to use a fixed number of rollouts
+        """
+        if not self.anytime_mode or self.comm_deadline is None:
+            return None
+        now = asyncio.get_event_loop().time()
+        # leave time for replying to proposals and for later rounds
+        return now + max(self.comm_deadline - now, 0) * self.anytime_budget_fraction
+
     async def do_messaging_round(
         self,
         orders_data: OrdersData,
@@ -783,9 +820,29 @@ class SmartOrderAccepterBot(DipnetBot):
 
         await self.update_allies_and_foes()
 
-        best_proposer, best_orders = await get_best_orders(
-            self, valid_proposal_orders, shared_orders
+        # Reuse the previous decision unless the proposals, shared orders or stance changed
+        fingerprint = self.get_round_fingerprint(
+            valid_proposal_orders, shared_orders, power_stance
         )
+        inputs_changed = fingerprint != self.last_round_fingerprint
+        if inputs_changed:
+            best_proposer, best_orders = await get_best_orders(
+                self,
+                valid_proposal_orders,
+                shared_orders,
+                deadline=self.get_rollout_deadline(),
+            )
+            self.last_round_fingerprint = fingerprint
+            self.last_best_proposal = (best_proposer, best_orders)
+            cache_stats = self.rollout_cache.stats()
+            lookups = cache_stats["hits"] + cache_stats["misses"]
+            if lookups:
+                await self.send_intent_log(
+                    f"Rollout cache: {cache_stats['hits']}/{lookups} hits "
+                    f"({cache_stats['hits'] / lookups:0.0%}) this phase"
+                )
+        else:
+            best_proposer, best_orders = self.last_best_proposal
 
         # add orders
 
@@ -828,11 +885,13 @@ class SmartOrderAccepterBot(DipnetBot):
 
         # send ALY requests at the start of the game
         if self.game.phase == "SPRING 1901 MOVEMENT":
+            aly_msgs_data = MessagesData()
             for pow in self.opponents:
                 aly = [self.power_name[:3], pow[:3]]
                 vss = [country[:3] for country in self.opponents if country != pow]
                 aly_msg = PRP(ALYVSS(aly_powers=aly, vss_powers=vss))
-                await self.send_message(pow, str(aly_msg), msgs_data)
+                aly_msgs_data.add_message(pow, str(aly_msg))
+            await self.send_messages_batch(aly_msgs_data, msgs_data)
             await self.send_intent_log(
                 f"Proposing alliances with {', '.join(self.opponents)}"
             )
@@ -846,12 +905,17 @@ class SmartOrderAccepterBot(DipnetBot):
         await self.respond_to_peace_messages(msgs_data)
 
         # generate proposal response YES/NO to allies
-        msgs_data = await self.gen_proposal_reply(
-            best_proposer, valid_proposal_orders, msgs_data
-        )
+        # Replies were already sent if the decision was reused
+        if inputs_changed:
+            msgs_data = await self.gen_proposal_reply(
+                best_proposer, valid_proposal_orders, msgs_data
+            )
 
         dipnet_ords = list(self.orders)
-        await self.send_intent_log(f"Using orders {dipnet_ords}")
+        # Only report orders that changed since the previous round
+        if self.last_used_orders is None or self.orders.diff(self.last_used_orders):
+            await self.send_intent_log(f"Using orders {dipnet_ords}")
+            self.last_used_orders = self.orders.copy()
 
         if not USE_LIMITED_DAIDE:
             await self.send_fake_orders_to_foes(dipnet_ords, msgs_data)
@@ -866,6 +930,7 @@ class SmartOrderAccepterBot(DipnetBot):
         orders = await self.get_brain_orders()
         orders_data = OrdersData()
         orders_data.add_orders(orders)
+        self.last_used_orders = None
         await self.send_intent_log(
             f"Initial orders (before communication): {list(orders_data)}"
         )
@@ -905,6 +970,10 @@ class SmartOrderAccepterBot(DipnetBot):
                     orders_data, power_stance, msgs_data
                 )
         else:
+            loop = asyncio.get_event_loop()
+            # Set aside 10s for cancellation
+            wait_time = self.communication_stage_length - 10
+            self.comm_deadline = loop.time() + wait_time
 
             async def run_messaging_loop() -> None:
                 nonlocal orders_data
@@ -914,16 +983,24 @@ class SmartOrderAccepterBot(DipnetBot):
                 while True:
                     # sleep for a random amount of time before retrieving new messages for the power
                     await asyncio.sleep(random.uniform(0.5, 1.5))
+                    # Rounds in anytime mode fit their rollouts in the remaining time,
+                    # so the loop can end on its own instead of being cancelled
+                    if self.anytime_mode and loop.time() >= self.comm_deadline:
+                        print("Exiting communication phase at the deadline")
+                        break
 
                     orders_data = await self.do_messaging_round(
                         orders_data, power_stance, msgs
                     )
 
             try:
-                # Set aside 10s for cancellation
-                wait_time = self.communication_stage_length - 10
-                await asyncio.wait_for(run_messaging_loop(), timeout=wait_time)
+                # In anytime mode, cancellation is only a fallback for rounds
+                # that overrun the deadline, so it uses half of the time set aside
+                timeout = wait_time + 5 if self.anytime_mode else wait_time
+                await asyncio.wait_for(run_messaging_loop(), timeout=timeout)
             except asyncio.TimeoutError:
                 print("Exiting communication phase because out of time")
+            finally:
+                self.comm_deadline = None
 
         return list(orders_data)
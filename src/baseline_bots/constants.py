@@ -0,0 +1,13 @@
+"""
+Lightweight constants, importable without building DAIDE grammars or loading the game engine
+"""
+
+POWER_NAMES_DICT = {
+    "AUS": "AUSTRIA",
+    "ENG": "ENGLAND",
+    "FRA": "FRANCE",
+    "GER": "GERMANY",
+    "ITA": "ITALY",
+    "RUS": "RUSSIA",
+    "TUR": "TURKEY",
+}
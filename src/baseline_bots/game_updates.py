@@ -0,0 +1,85 @@
+"""
+Waiting for changes to a game, woken by server notifications instead of fixed-interval polling
+"""
+
+import asyncio
+from typing import Any, Callable, Optional, Set
+
+from diplomacy import Game
+from diplomacy.client import notification_managers
+from diplomacy.client.network_game import NetworkGame
+
+
+async def wait_until(
+    condition: Callable[[], bool],
+    initial_delay: float = 0.1,
+    max_delay: float = 1.0,
+    wakeup: Optional[asyncio.Event] = None,
+) -> None:
+    """Waits until a condition holds
+
+    The condition is checked again as soon as `wakeup` is set,
+    and otherwise after delays doubling from `initial_delay` up to `max_delay`.
+
+    :param condition: function returning whether to stop waiting
+    :param initial_delay: seconds before the first check without a wakeup
+    :param max_delay: maximum seconds between two checks
+    :param wakeup: event set when the condition may have changed
+    """
+    delay = initial_delay
+    while True:
+        if wakeup is not None:
+            wakeup.clear()
+        if condition():
+            return
+        if wakeup is None:
+            await asyncio.sleep(delay)
+        else:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        delay = min(delay * 2, max_delay)
+
+
+class GameUpdateWaiter:
+    """Waits for conditions on a game, checking them again whenever the server notifies a change
+
+    Network games notify phase updates, status updates, messages, comm status changes, etc.
+    Local games send no notifications, so their conditions are only polled.
+    """
+
+    def __init__(self, game: Game) -> None:
+        """
+        :param game: game to subscribe to
+        """
+        self._wakeups: Set[asyncio.Event] = set()
+        if isinstance(game, NetworkGame):
+            # The client updates the game before calling callbacks, for every notification class it handles
+            for notification_class in notification_managers.MAPPING:
+                game.add_notification_callback(
+                    notification_class, self._on_notification
+                )
+
+    def _on_notification(self, game: NetworkGame, notification: Any) -> None:
+        for wakeup in self._wakeups:
+            wakeup.set()
+
+    async def wait_until(
+        self,
+        condition: Callable[[], bool],
+        initial_delay: float = 0.1,
+        max_delay: float = 1.0,
+    ) -> None:
+        """Waits until a condition on the game holds
+
+        :param condition: function returning whether to stop waiting
+        :param initial_delay: seconds before the first check without a notification
+        :param max_delay: maximum seconds between two checks without a notification
+        """
+        wakeup = asyncio.Event()
+        self._wakeups.add(wakeup)
+        try:
+            await wait_until(condition, initial_delay, max_delay, wakeup)
+        finally:
+            self._wakeups.discard(wakeup)
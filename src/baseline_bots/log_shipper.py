@@ -0,0 +1,113 @@
+"""
+Background shipping of intent logs, so logging does not wait on server round trips
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+
+class IntentLogShipper:
+    """Sends log lines to the server in batches from a background task
+
+    Lines submitted during a flush interval are joined into a single log entry.
+    When more than `max_pending` lines are waiting, or when the server fails or is too slow
+    to accept a batch, lines are appended to `spill_path` if given and dropped otherwise.
+    """
+
+    def __init__(
+        self,
+        send_log: Callable[[str], Awaitable[None]],
+        flush_interval: float = 1.0,
+        max_pending: int = 1000,
+        send_timeout: float = 10.0,
+        spill_path: Optional[str] = None,
+    ) -> None:
+        """
+        :param send_log: coroutine function sending a log entry to the server
+        :param flush_interval: seconds during which lines are gathered before being sent
+        :param max_pending: maximum number of lines waiting to be sent
+        :param send_timeout: seconds after which sending a batch is abandoned
+        :param spill_path: file to which lines that cannot be sent are appended
+        """
+        self.send_log = send_log
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.spill_path = spill_path
+        self.sent = 0
+        self.dropped = 0
+        self.spilled = 0
+        # Created on first use, inside the running event loop
+        self._queue: Optional["asyncio.Queue[str]"] = None
+        self._send_lock: Optional[asyncio.Lock] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        # Lines taken from the queue but not sent yet
+        self._batch: List[str] = []
+
+    def submit(self, line: str) -> None:
+        """Queues a log line without waiting for it to be sent
+
+        :param line: log line
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._send_lock = asyncio.Lock()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        try:
+            self._queue.put_nowait(line)
+        except asyncio.QueueFull:
+            self._overflow([line])
+
+    async def flush(self) -> None:
+        """Sends all queued lines now"""
+        if self._queue is None:
+            return
+        async with self._send_lock:
+            while not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+            if not self._batch:
+                return
+            lines, self._batch = self._batch, []
+            try:
+                await asyncio.wait_for(
+                    self.send_log("\n".join(lines)), timeout=self.send_timeout
+                )
+                self.sent += len(lines)
+            except asyncio.CancelledError:
+                # Lines are sent again by the next flush
+                self._batch[:0] = lines
+                raise
+            except Exception as e:
+                print(
+                    f"Failed to send {len(lines)} intent log lines: {type(e).__name__}: {e}"
+                )
+                self._overflow(lines)
+
+    async def close(self) -> None:
+        """Stops the background task and sends the remaining lines"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            self._batch.append(await self._queue.get())
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _overflow(self, lines: List[str]) -> None:
+        if self.spill_path is not None:
+            try:
+                with open(self.spill_path, "a") as file:
+                    file.writelines(f"{line}\n" for line in lines)
+                self.spilled += len(lines)
+                return
+            except OSError as e:
+                print(f"Failed to spill intent logs to {self.spill_path!r}: {e}")
+        self.dropped += len(lines)
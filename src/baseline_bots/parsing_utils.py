@@ -3,8 +3,8 @@ Some quickly built parsing utils mostly for DAIDE stuff
 """
 
 import asyncio
-from collections import defaultdict
-from typing import Dict, List, Mapping, Tuple, Union
+from collections import ChainMap, OrderedDict, defaultdict
+from typing import Dict, List, Mapping, Optional, Tuple, Union
 
 from daidepp import (
     ALYVSS,
@@ -24,10 +24,12 @@ from diplomacy import Game, Message
 
 from baseline_bots.utils import (
     DEBUG_MODE,
-    get_order_tokens,
+    get_possible_orders_set,
+    get_unit_power_index,
+    iter_sub_arrangements,
     parse_alliance_proposal,
-    parse_arrangement,
     parse_daide,
+    parse_order,
     parse_peace_proposal,
 )
 
@@ -91,10 +93,90 @@ def daidefy_unit(dipnet_unit: str, unit_game_mapping: Mapping[str, str]) -> Unit
     return unit
 
 
+class OrderTranslationCache:
+    """Phase-scoped cache of order translations between DipNet and DAIDE
+
+    DipNet-to-DAIDE entries are keyed by the canonical order and the powers owning the units
+    in it, since the same order string translates differently when the units change hands.
+    DAIDE-to-DipNet entries are keyed by the DAIDE string, which already includes the powers.
+    Both directions and the hit/miss counters are cleared when the phase changes.
+    Translating DAIDE to DipNet does not need the game, so that path cannot report phase changes;
+    its entries are also bounded, evicting the least recently used ones.
+    """
+
+    def __init__(self, max_dipnet_entries: int = 4096) -> None:
+        """
+        :param max_dipnet_entries: maximum number of DAIDE-to-DipNet translations to keep
+        """
+        self.phase: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.max_dipnet_entries = max_dipnet_entries
+        self._to_daide: Dict[Tuple[str, Tuple[str, ...]], Command] = {}
+        self._to_dipnet: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+
+    def start_phase(self, phase: str) -> None:
+        """Clears the cache and its counters if the phase changed"""
+        if phase != self.phase:
+            self.phase = phase
+            self._to_daide.clear()
+            self._to_dipnet.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_daide(self, key: Tuple[str, Tuple[str, ...]]) -> Optional[Command]:
+        """
+        :param key: canonical DipNet-style order and powers owning its units
+        :return: cached DAIDE-style order, or `None` if it was not translated yet
+        """
+        command = self._to_daide.get(key)
+        if command is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return command
+
+    def put_daide(self, key: Tuple[str, Tuple[str, ...]], command: Command) -> None:
+        self._to_daide[key] = command
+
+    def get_dipnet(self, daide_order: str) -> Optional[Tuple[str, str]]:
+        """
+        :param daide_order: DAIDE-style order string
+        :return: cached DipNet-style order and unit's power, or `None` if it was not translated yet
+        """
+        translation = self._to_dipnet.get(daide_order)
+        if translation is None:
+            self.misses += 1
+        else:
+            self._to_dipnet.move_to_end(daide_order)
+            self.hits += 1
+        return translation
+
+    def put_dipnet(self, daide_order: str, translation: Tuple[str, str]) -> None:
+        self._to_dipnet[daide_order] = translation
+        self._to_dipnet.move_to_end(daide_order)
+        while len(self._to_dipnet) > self.max_dipnet_entries:
+            self._to_dipnet.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: dictionary of hit/miss counters and current cache size
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._to_daide) + len(self._to_dipnet),
+        }
+
+
+ORDER_TRANSLATION_CACHE = OrderTranslationCache()
+
+
 def dipnet_to_daide_parsing(
     dipnet_style_order_strs: List[Union[str, Tuple[str, str]]],
     game: Game,
     unit_power_tuples_included: bool = False,
+    unit_power_index: Optional[Mapping[str, str]] = None,
 ) -> List[Command]:
     """Convert set of DipNet-style orders to DAIDE-style orders
 
@@ -107,6 +189,8 @@ def dipnet_to_daide_parsing(
     :param game: game instance
     :param unit_power_tuples_included: Whether the unit power will also be included in
         dipnet_style_order_strs along with the orders like this: ("A SEV - RUM", "RUS")
+    :param unit_power_index: Mapping from DipNet-style units to abbreviated power names.
+        Defaults to the cached index from `get_unit_power_index` for the game's current position.
     :return: List of DAIDE-style orders
     """
 
@@ -116,9 +200,9 @@ def dipnet_to_daide_parsing(
     # Convert strings to order tokens and store a dictionary mapping of armies to be convoyed and fleets helping to convoy
     for i in range(len(dipnet_style_order_strs)):
         if not (unit_power_tuples_included):
-            dipnet_style_order_strs_tokens[i] = get_order_tokens(
+            dipnet_style_order_strs_tokens[i] = parse_order(
                 dipnet_style_order_strs[i]
-            )
+            ).tokens
             if dipnet_style_order_strs_tokens[i][1] == "C":
                 convoy_map[
                     dipnet_style_order_strs_tokens[i][2]
@@ -126,7 +210,7 @@ def dipnet_to_daide_parsing(
                 ].append(dipnet_style_order_strs_tokens[i][0].split()[-1])
         else:  # If unit powers are also included in the input, then use the right values
             dipnet_style_order_strs_tokens[i] = (
-                get_order_tokens(dipnet_style_order_strs[i][0]),
+                parse_order(dipnet_style_order_strs[i][0]).tokens,
                 dipnet_style_order_strs[i][1],
             )
             if dipnet_style_order_strs_tokens[i][0][1] == "C":
@@ -135,6 +219,11 @@ def dipnet_to_daide_parsing(
                     + dipnet_style_order_strs_tokens[i][0][3]
                 ].append(dipnet_style_order_strs_tokens[i][0][0].split()[-1])
 
+    # Unit to power mapping for constructing DAIDE tokens, shared by all orders
+    if unit_power_index is None:
+        unit_power_index = get_unit_power_index(game)
+    ORDER_TRANSLATION_CACHE.start_phase(game.get_current_phase())
+
     daide_orders = []
 
     # For each order
@@ -144,15 +233,13 @@ def dipnet_to_daide_parsing(
             if unit_power_tuples_included:
                 dipnet_order_tokens, unit_power = dipnet_order_tokens
 
-            # Create unit to power mapping for constructing DAIDE tokens
-            unit_game_mapping = {}
-            for power, units in game.get_units().items():
-                for unit in units:
-                    unit_game_mapping[unit] = power[:3]
-
             # If unit powers are also included in the input, then add the unit - unit power mapping for DAIDE construction
             if unit_power_tuples_included:
-                unit_game_mapping[dipnet_order_tokens[0]] = unit_power
+                unit_game_mapping = ChainMap(
+                    {dipnet_order_tokens[0]: unit_power}, unit_power_index
+                )
+            else:
+                unit_game_mapping = unit_power_index
 
             if dipnet_order_tokens[0] not in unit_game_mapping:
                 raise ValueError(
@@ -167,6 +254,22 @@ def dipnet_to_daide_parsing(
                     f"Target unit {dipnet_order_tokens[2]!r} does not have a corresponding power"
                 )
 
+            # Convoyed moves depend on the convoy orders in the same set, so they are not cached
+            if len(dipnet_order_tokens) >= 3 and dipnet_order_tokens[2] == "VIA":
+                cache_key = None
+            else:
+                order_units = dipnet_order_tokens[:1]
+                if dipnet_order_tokens[1] in {"S", "C"}:
+                    order_units = dipnet_order_tokens[:3:2]
+                cache_key = (
+                    " ".join(dipnet_order_tokens),
+                    tuple(unit_game_mapping[unit] for unit in order_units),
+                )
+                cached_order = ORDER_TRANSLATION_CACHE.get_daide(cache_key)
+                if cached_order is not None:
+                    daide_orders.append(cached_order)
+                    continue
+
             # Daidefy and add source unit as it is
             acting_unit = daidefy_unit(dipnet_order_tokens[0], unit_game_mapping)
 
@@ -185,24 +288,21 @@ def dipnet_to_daide_parsing(
                 else:
                     province_no_coast = None
 
-                support_order = SUP(
+                daide_order = SUP(
                     supporting_unit=acting_unit,
                     supported_unit=target_unit,
                     province_no_coast=province_no_coast,
                 )
-                daide_orders.append(support_order)
             elif dipnet_order_tokens[1] == "H":
-                hold_order = HLD(acting_unit)
-                daide_orders.append(hold_order)
+                daide_order = HLD(acting_unit)
             elif dipnet_order_tokens[1] == "C":
                 target_unit = daidefy_unit(dipnet_order_tokens[2], unit_game_mapping)
                 target_prov = daidefy_location(dipnet_order_tokens[3].split()[-1])
-                convoy_order = CVY(
+                daide_order = CVY(
                     convoying_unit=acting_unit,
                     convoyed_unit=target_unit,
                     province=target_prov,
                 )
-                daide_orders.append(convoy_order)
             elif len(dipnet_order_tokens) >= 3 and dipnet_order_tokens[2] == "VIA":
                 province = daidefy_location(dipnet_order_tokens[1].split()[-1])
                 if dipnet_order_tokens[0] + dipnet_order_tokens[1] in convoy_map:
@@ -213,17 +313,18 @@ def dipnet_to_daide_parsing(
                         f"Found unexpected order {' '.join(dipnet_order_tokens)!r} which "
                         "doesn't have convoying fleet in its own set of orders"
                     )
-                via_cto_order = MoveByCVY(acting_unit, province, *seas)
-                daide_orders.append(via_cto_order)
+                daide_order = MoveByCVY(acting_unit, province, *seas)
             else:
                 target_location = daidefy_location(dipnet_order_tokens[1].split()[-1])
-                move_order = MTO(acting_unit, target_location)
+                daide_order = MTO(acting_unit, target_location)
                 if len(dipnet_order_tokens) > 2:
                     raise NotImplementedError(
                         f"Cannot process DipNet movement order {' '.join(dipnet_order_tokens)!r} "
                         "because it has more than 2 tokens"
                     )
-                daide_orders.append(move_order)
+            daide_orders.append(daide_order)
+            if cache_key is not None:
+                ORDER_TRANSLATION_CACHE.put_daide(cache_key, daide_order)
         except asyncio.CancelledError:
             raise
         except Exception as e:
@@ -276,6 +377,10 @@ def daide_to_dipnet_parsing(daide_order: Command) -> Tuple[str, str]:
     :param daide_order: DAIDE-style order to be converted to DipNet style
     :return: DipNet-style order string and unit's power name
     """
+    cache_key = str(daide_order)
+    translation = ORDER_TRANSLATION_CACHE.get_dipnet(cache_key)
+    if translation is not None:
+        return translation
 
     try:
         # Dipnetify source unit
@@ -309,6 +414,7 @@ def daide_to_dipnet_parsing(daide_order: Command) -> Tuple[str, str]:
                 f"Conversion for {type(daide_order).__name__} commands has not been implemented yet"
             )
 
+        ORDER_TRANSLATION_CACHE.put_dipnet(cache_key, (dipnet_order, unit_power))
         return dipnet_order, unit_power
     except asyncio.CancelledError:
         raise
@@ -344,10 +450,13 @@ def parse_proposal_messages(
         peace proposals
     """
     try:
-        # Extract messages containing PRP string
-        order_msgs = [
-            msg for msg in rcvd_messages if isinstance(parse_daide(msg.message), PRP)
-        ]
+        # Extract messages containing PRP string, keeping their parsed form
+        parsed_order_msgs = []
+        for msg in rcvd_messages:
+            parsed_msg = parse_daide(msg.message)
+            if isinstance(parsed_msg, PRP):
+                parsed_order_msgs.append((msg, parsed_msg))
+        order_msgs = [order_msg for order_msg, _ in parsed_order_msgs]
         print(f"Received {len(order_msgs)} PRP messages:")
         print([(order_msg.sender, order_msg.message) for order_msg in order_msgs])
 
@@ -361,12 +470,10 @@ def parse_proposal_messages(
         alliance_proposals = defaultdict(list)
         peace_proposals = defaultdict(list)
 
-        for order_msg in order_msgs:
+        for order_msg, parsed_msg in parsed_order_msgs:
             try:
-                daide_style_orders = [
-                    parse_daide(order) for order in parse_arrangement(order_msg.message)
-                ]
-                for order in daide_style_orders:
+                # Classify the already parsed subarrangements in a single pass
+                for order in iter_sub_arrangements(parsed_msg.arrangement):
                     if isinstance(order, XDO):
                         temp_message = daide_to_dipnet_parsing(order.order)
                         if temp_message:
@@ -397,17 +504,8 @@ def parse_proposal_messages(
                     raise e
                 continue
 
-        # Generate set of possible orders for the given power
-        orderable_locs = game.get_orderable_locations(power_name)
-        all_possible_orders = game.get_all_possible_orders()
-        possible_orders = set(
-            [
-                ord
-                for ord_key in all_possible_orders
-                for ord in all_possible_orders[ord_key]
-                if ord_key in orderable_locs
-            ]
-        )
+        # Set of possible orders for the given power
+        possible_orders = get_possible_orders_set(game, power_name)
 
         # For the set of proposed moves from each sender,
         # check if the specified orders would be allowed.
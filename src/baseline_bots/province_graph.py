@@ -0,0 +1,164 @@
+"""
+Integer-indexed province graphs shared by order randomization and neighbourhood queries
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence
+
+from diplomacy import Map
+import numpy as np
+
+
+class ProvinceGraph:
+    """Province adjacency as a boolean matrix over an indexed table of locations
+
+    Locations are upper-case and coast-aware ('STP', 'STP/NC' and 'STP/SC' are three locations).
+    Sets of locations are represented as boolean masks over the location table,
+    so unions and intersections of neighbourhoods are bitwise operations.
+    """
+
+    def __init__(
+        self,
+        adjacency: Mapping[str, Sequence[str]],
+        types: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """
+        :param adjacency: dictionary of location -> adjacent locations,
+            in the order in which neighbours are listed by `neighbor_names`
+        :param types: dictionary of location -> location type (e.g., "COAST", "WATER" or "LAND")
+        """
+        types = {loc.upper(): loc_type for loc, loc_type in (types or {}).items()}
+        names = set(adjacency) | set(types)
+        names.update(loc for adjacent in adjacency.values() for loc in adjacent)
+        # The province of every coast is a location as well
+        names.update(name.split("/")[0] for name in list(names))
+
+        self.locations: List[str] = sorted(names)
+        self.index: Dict[str, int] = {loc: i for i, loc in enumerate(self.locations)}
+        size = len(self.locations)
+
+        self.adjacency = np.zeros((size, size), dtype=bool)
+        self._neighbor_ids: List[np.ndarray] = [
+            np.zeros(0, dtype=np.intp) for _ in range(size)
+        ]
+        for loc, adjacent in adjacency.items():
+            ids = np.array([self.index[adj] for adj in adjacent], dtype=np.intp)
+            self._neighbor_ids[self.index[loc]] = ids
+            self.adjacency[self.index[loc], ids] = True
+
+        # Index of the province (location without coast) of each location
+        self.province_ids = np.array(
+            [self.index[loc.split("/")[0]] for loc in self.locations], dtype=np.intp
+        )
+
+        # Province of each location, e.g. 'STP' for 'STP/NC'
+        self.province_of: Dict[str, str] = {
+            loc: loc.split("/")[0] for loc in self.locations
+        }
+        # Table of adjacent locations, built on first request by `neighborhoods`
+        self._neighborhoods: Optional[Dict[str, FrozenSet[str]]] = None
+
+        self.type_masks: Dict[str, np.ndarray] = {}
+        for loc, loc_type in types.items():
+            if loc_type not in self.type_masks:
+                self.type_masks[loc_type] = np.zeros(size, dtype=bool)
+            self.type_masks[loc_type][self.index[loc]] = True
+
+    @classmethod
+    def from_map(cls, game_map: Map) -> "ProvinceGraph":
+        """Builds the graph of a map, with the upper-cased adjacencies from `Map.abut_list`"""
+        names = {loc.upper() for loc in game_map.locs}
+        return cls(
+            {
+                name: list(
+                    dict.fromkeys(adj.upper() for adj in game_map.abut_list(name))
+                )
+                for name in sorted(names)
+            }
+        )
+
+    def mask(self, locations: Iterable[str]) -> np.ndarray:
+        """
+        :param locations: upper-case location names. Names missing from the graph are ignored.
+        :return: boolean mask of the locations
+        """
+        mask = np.zeros(len(self.locations), dtype=bool)
+        mask[[self.index[loc] for loc in locations if loc in self.index]] = True
+        return mask
+
+    def names(self, mask: np.ndarray) -> List[str]:
+        """
+        :param mask: boolean mask of locations
+        :return: sorted names of the locations in the mask
+        """
+        return [self.locations[i] for i in np.flatnonzero(mask)]
+
+    def types_mask(self, types: Iterable[str]) -> np.ndarray:
+        """
+        :param types: location types
+        :return: boolean mask of the locations having any of the types
+        """
+        mask = np.zeros(len(self.locations), dtype=bool)
+        for loc_type in types:
+            if loc_type in self.type_masks:
+                mask |= self.type_masks[loc_type]
+        return mask
+
+    def adjacent_mask(self, loc: str) -> np.ndarray:
+        """
+        :return: boolean mask of the locations adjacent to a location
+        """
+        return self.adjacency[self.index[loc]]
+
+    def neighbors_mask(self, mask: np.ndarray) -> np.ndarray:
+        """
+        :param mask: boolean mask of locations
+        :return: boolean mask of the locations adjacent to any location in the mask
+        """
+        return self.adjacency[mask].any(axis=0)
+
+    def in_provinces(self, mask: np.ndarray) -> np.ndarray:
+        """
+        :param mask: boolean mask of locations
+        :return: boolean mask of the locations whose province (e.g., 'STP' for 'STP/NC') is in the mask
+        """
+        return mask[self.province_ids]
+
+    def neighborhoods(self) -> Dict[str, FrozenSet[str]]:
+        """Gets the table of locations adjacent to each location
+
+        The table is only built when first requested, then kept for the lifetime of the graph.
+
+        :return: dictionary of location -> adjacent locations
+        """
+        if self._neighborhoods is None:
+            self._neighborhoods = {
+                loc: frozenset(self.names(self.adjacency[i]))
+                for i, loc in enumerate(self.locations)
+            }
+        return self._neighborhoods
+
+    def neighbor_names(self, loc: str, mask: Optional[np.ndarray] = None) -> List[str]:
+        """
+        :param loc: location whose neighbours to list
+        :param mask: if given, only neighbours in this boolean mask are listed
+        :return: neighbours of the location, in the order given when building the graph
+        """
+        ids = self._neighbor_ids[self.index[loc]]
+        if mask is not None:
+            ids = ids[mask[ids]]
+        return [self.locations[i] for i in ids]
+
+
+_MAP_GRAPHS: Dict[str, ProvinceGraph] = {}
+
+
+def get_map_graph(game_map: Map) -> ProvinceGraph:
+    """
+    :param game_map: map of a game
+    :return: province graph of the map, built once per map name
+    """
+    graph = _MAP_GRAPHS.get(game_map.name)
+    if graph is None:
+        graph = ProvinceGraph.from_map(game_map)
+        _MAP_GRAPHS[game_map.name] = graph
+    return graph
@@ -23,6 +23,7 @@ from daidepp import (
 )
 
 from baseline_bots.parsing_utils import daidefy_location, dipnetify_location
+from baseline_bots.province_graph import ProvinceGraph
 
 # The comments below signal the formatter not to expand these dicts to multiple lines
 # fmt: off
@@ -139,6 +140,9 @@ COMBOS = {
     "AMY": {"FLT": {"COAST"}, "AMY": {"LAND", "COAST"}},
 }
 
+# Indexed view of ADJACENCY and TYPES, so filtering adjacent locations uses boolean masks
+GRAPH = ProvinceGraph(ADJACENCY, TYPES)
+
 # This represents the DAIDE commands that join orders which are handled in this file
 joiners = {"AND", "ORR"}
 
@@ -193,21 +197,16 @@ def random_convoy_to(order: MoveByCVY) -> MoveByCVY:
     :rtype: Tuple
     """
     amy_loc = dipnetify_location(order.unit.location)
-    province = dipnetify_location(order.province)
     sea_provinces = [dipnetify_location(Location(sea)) for sea in order.province_seas]
     sea_provinces = list(reversed(sea_provinces))
     for i, sea in enumerate(
         sea_provinces
     ):  # searches through the sea provinces in reversed order to find the longest possible alternate convoy
-        # fmt : off
-        valid = [
-            loc
-            for loc in ADJACENCY[sea]
-            if TYPES[loc] == "COAST"
-            and loc != [province]
-            and loc not in ADJACENCY[amy_loc]
-        ]  # the location must not be the one the unit is already convoying to
-        # fmt: on
+        # coasts next to the sea that the unit cannot reach by itself
+        # NOTE: The destination the unit is already convoyed to is not excluded
+        valid = GRAPH.neighbor_names(
+            sea, GRAPH.type_masks["COAST"] & ~GRAPH.adjacent_mask(amy_loc)
+        )
         if valid:
             route = tuple(
                 (reversed(sea_provinces[i:]))
@@ -240,8 +239,10 @@ def random_convoy(order: CVY) -> CVY:
     province = dipnetify_location(order.province)
     adj = [
         str(daidefy_location(loc))
-        for loc in ADJACENCY[flt_loc]
-        if TYPES[loc] == "COAST" and loc not in ADJACENCY[amy_loc] and loc != province
+        for loc in GRAPH.neighbor_names(
+            flt_loc, GRAPH.type_masks["COAST"] & ~GRAPH.adjacent_mask(amy_loc)
+        )
+        if loc != province
     ]
     if adj:  # if valid adjacencies exist
         return CVY(
@@ -268,18 +269,17 @@ def random_support(order: SUP) -> SUP:
         supporter_loc = dipnetify_location(order.supporting_unit.location)
         supported_type = order.supported_unit.unit_type
         supported_loc = dipnetify_location(order.supported_unit.location)
-        supporter_adjacent, supported_adjacent = (
-            ADJACENCY[supporter_loc],
-            ADJACENCY[supported_loc],
-        )
         dest_choices = COMBOS[supporter_type][
             supported_type
         ]  # Set of possible destinations
+        dest_mask = GRAPH.adjacent_mask(supported_loc)
+        if dest_choices:
+            dest_mask = dest_mask & GRAPH.types_mask(dest_choices)
         adj_to_both = [
             daidefy_location(adjacency).province
-            for adjacency in supporter_adjacent  # this finds all provinces adjacent to the supportee and suporter locations
-            if adjacency in supported_adjacent
-            and (not dest_choices or TYPES[adjacency] in dest_choices)
+            for adjacency in GRAPH.neighbor_names(
+                supporter_loc, dest_mask
+            )  # this finds all provinces adjacent to the supportee and suporter locations
         ]
         # fmt: on
         chance_of_move = 0.5  # the chance of a support hold becoming a move is 50/50
@@ -296,13 +296,12 @@ def random_support(order: SUP) -> SUP:
         rec_type = order.supported_unit.unit_type
         rec_loc = dipnetify_location(order.supported_unit.location)
         province = dipnetify_location(Location(order.province_no_coast))
-        sup_adjacent, rec_adjacent = ADJACENCY[sup_loc], ADJACENCY[rec_loc]
         # COMBOS and TYPES must be used to determine the possible locations a unit can support into/from based on the unit type and province type
         dest_choices = COMBOS[sup_type][rec_type]
         adj_to_both = [
             daidefy_location(adjacency).province
-            for adjacency in sup_adjacent
-            if adjacency in rec_adjacent and adjacency != province and TYPES[adjacency]
+            for adjacency in GRAPH.neighbor_names(sup_loc, GRAPH.adjacent_mask(rec_loc))
+            if adjacency != province
         ]
         if adj_to_both:
             return SUP(
@@ -330,7 +329,7 @@ def random_movement(
     ):  # There is a 50/50 chance of switching a move to a hold, 0 for a retreat since that may make one less believable
         loc = dipnetify_location(unit.location)
         dest = dipnetify_location(order.location)
-        all_adjacent = ADJACENCY[loc].copy()
+        all_adjacent = GRAPH.neighbor_names(loc)
         if dest in all_adjacent:
             all_adjacent.remove(
                 dest
@@ -357,7 +356,7 @@ def random_hold(order: HLD, chance_of_move: float = 0.8) -> Union[MTO, HLD]:
     ):  # The chance of changing the hold to a move is high
         loc = dipnetify_location(order.unit.location)
         move_loc = random.choice(
-            ADJACENCY[loc]
+            GRAPH.neighbor_names(loc)
         )  # randomly chooses an adjacent location
         return MTO(order.unit, daidefy_location(move_loc))
     else:
@@ -5,11 +5,37 @@ It would be preferable to use a real DAIDE parser in prod
 
 
 import asyncio
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import collections.abc
 from copy import deepcopy
+from functools import lru_cache
+import hashlib
 import os
-from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import pickle
+import re
+import sys
+import threading
+import time
+import weakref
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
 import daidepp
 from daidepp import (
@@ -29,19 +55,14 @@ from diplomacy import Game
 from diplomacy.utils import strings
 import numpy as np
 
+from baseline_bots.constants import POWER_NAMES_DICT
+from baseline_bots.province_graph import get_map_graph
+
 if TYPE_CHECKING:
     from baseline_bots.bots.dipnet_bot import DipnetBot
 
+T = TypeVar("T")
 
-POWER_NAMES_DICT = {
-    "AUS": "AUSTRIA",
-    "ENG": "ENGLAND",
-    "FRA": "FRANCE",
-    "GER": "GERMANY",
-    "ITA": "ITALY",
-    "RUS": "RUSSIA",
-    "TUR": "TURKEY",
-}
 
 # Option for debugging without specialized builds
 DEBUG_MODE = False
@@ -49,12 +70,329 @@ if os.environ.get("ALLAN_DEBUG") is not None:
     print("Enabling debugging mode")
     DEBUG_MODE = True
 
-MESSAGE_GRAMMAR = create_daide_grammar(level=MAX_DAIDE_LEVEL, string_type="message")
-# Grammar for limited DAIDE subset used in communications protocol
-LIMITED_MESSAGE_GRAMMAR = create_grammar_from_press_keywords(
-    ["ALY_VSS", "AND", "DMZ", "HUH", "NAR", "PCE", "PRP", "REJ", "XDO", "YES"]
-)
-ALL_GRAMMAR = create_daide_grammar(level=MAX_DAIDE_LEVEL, string_type="all")
+# Grammars are built on first use (see `get_grammar`), as (function, positional arguments, keyword arguments)
+_GRAMMAR_SPECS: Dict[str, Tuple[Callable[..., DAIDEGrammar], Tuple, Dict[str, Any]]] = {
+    "MESSAGE_GRAMMAR": (
+        create_daide_grammar,
+        (),
+        {"level": MAX_DAIDE_LEVEL, "string_type": "message"},
+    ),
+    # Grammar for limited DAIDE subset used in communications protocol
+    "LIMITED_MESSAGE_GRAMMAR": (
+        create_grammar_from_press_keywords,
+        (["ALY_VSS", "AND", "DMZ", "HUH", "NAR", "PCE", "PRP", "REJ", "XDO", "YES"],),
+        {},
+    ),
+    "ALL_GRAMMAR": (
+        create_daide_grammar,
+        (),
+        {"level": MAX_DAIDE_LEVEL, "string_type": "all"},
+    ),
+}
+_GRAMMARS: Dict[str, DAIDEGrammar] = {}
+_GRAMMARS_LOCK = threading.Lock()
+
+# Option for reusing compiled grammars between processes:
+# directory where they are pickled (only use a directory no one else can write to)
+GRAMMAR_CACHE_DIR = os.environ.get("ALLAN_GRAMMAR_CACHE_DIR")
+
+
+def _get_package_version(package: str) -> Optional[str]:
+    """
+    :param package: name of an installed distribution
+    :return: its version, or `None` if it cannot be determined
+    """
+    try:
+        try:
+            from importlib.metadata import version  # Python 3.8+
+        except ImportError:
+            import pkg_resources
+
+            return pkg_resources.get_distribution(package).version
+        return version(package)
+    except Exception:
+        return None
+
+
+def _get_grammar_cache_path(name: str) -> str:
+    function, args, kwargs = _GRAMMAR_SPECS[name]
+    # Cached grammars are invalidated by changes to any of daidepp's sources
+    # (installs from Git do not always change the version), to the grammar arguments,
+    # or to the versions of Python, daidepp and parsimonious
+    digest = hashlib.sha1()
+    package_dir = os.path.dirname(daidepp.__file__)
+    for directory, subdirectories, files in os.walk(package_dir):
+        subdirectories.sort()
+        for file_name in sorted(files):
+            if file_name.endswith(".py"):
+                path = os.path.join(directory, file_name)
+                digest.update(os.path.relpath(path, package_dir).encode())
+                with open(path, "rb") as file:
+                    digest.update(file.read())
+    digest.update(
+        repr(
+            (
+                function.__name__,
+                args,
+                sorted(kwargs.items()),
+                sys.version_info[:2],
+                _get_package_version("daidepp"),
+                _get_package_version("parsimonious"),
+            )
+        ).encode()
+    )
+    return os.path.join(GRAMMAR_CACHE_DIR, f"{name}-{digest.hexdigest()[:16]}.pickle")
+
+
+def _load_or_build_grammar(name: str) -> DAIDEGrammar:
+    function, args, kwargs = _GRAMMAR_SPECS[name]
+    if GRAMMAR_CACHE_DIR is None:
+        return function(*args, **kwargs)
+
+    path = _get_grammar_cache_path(name)
+    try:
+        with open(path, "rb") as file:
+            cached_grammar = pickle.load(file)
+        if isinstance(cached_grammar, DAIDEGrammar):
+            return cached_grammar
+        print(f"ALLAN: ignoring cached DAIDE grammar {path!r} of the wrong type")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # Unpickling can fail in many ways (truncated files, renamed classes, ...),
+        # so any error falls back to building the grammar
+        print(f"ALLAN: failed to load cached DAIDE grammar {path!r}: {e}")
+
+    grammar = function(*args, **kwargs)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(GRAMMAR_CACHE_DIR, exist_ok=True)
+        with open(temp_path, "wb") as file:
+            pickle.dump(grammar, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except Exception as e:
+        print(f"ALLAN: failed to cache DAIDE grammar {path!r}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return grammar
+
+
+def get_grammar(name: str) -> DAIDEGrammar:
+    """Gets a DAIDE grammar, building it on first use.
+
+    If `ALLAN_GRAMMAR_CACHE_DIR` is set, built grammars are pickled to that directory
+    and later processes load them instead of building them again.
+
+    :param name: "MESSAGE_GRAMMAR", "LIMITED_MESSAGE_GRAMMAR" or "ALL_GRAMMAR"
+    :return: DAIDE grammar, shared by all callers
+    """
+    grammar = _GRAMMARS.get(name)
+    if grammar is None:
+        with _GRAMMARS_LOCK:
+            grammar = _GRAMMARS.get(name)
+            if grammar is None:
+                grammar = _load_or_build_grammar(name)
+                _GRAMMARS[name] = grammar
+    return grammar
+
+
+def __getattr__(name: str) -> Any:
+    # `MESSAGE_GRAMMAR`, `LIMITED_MESSAGE_GRAMMAR` and `ALL_GRAMMAR` are built on first access
+    if name in _GRAMMAR_SPECS:
+        return get_grammar(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Strings made only of these characters can be checked word by word before parsing
+_PLAIN_DAIDE_PATTERN = re.compile(r"[A-Za-z0-9()\s]*")
+_DAIDE_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+
+class DAIDEVocabulary:
+    """Words that a DAIDE grammar can match
+
+    Built from the literals (keywords, powers, provinces, ...) and regular expressions
+    (e.g., numbers) of the grammar's rules.
+    """
+
+    def __init__(self, grammar: DAIDEGrammar) -> None:
+        """
+        :param grammar: DAIDE grammar to collect the words of
+        """
+        words: Set[str] = set()
+        patterns: List[Pattern] = []
+        seen = set()
+        expressions = list(grammar.values())
+        while expressions:
+            expression = expressions.pop()
+            if id(expression) in seen:
+                continue
+            seen.add(id(expression))
+            literal = getattr(expression, "literal", None)
+            if isinstance(literal, str):
+                words.update(_DAIDE_WORD_PATTERN.findall(literal))
+            pattern = getattr(expression, "re", None)
+            if pattern is not None:
+                patterns.append(pattern)
+            expressions.extend(getattr(expression, "members", ()))
+
+        self.words = frozenset(words)
+        self.patterns = tuple(patterns)
+
+    def is_known_word(self, word: str) -> bool:
+        """
+        :param word: run of letters and digits from a DAIDE string
+        :return: whether the word can be matched by the grammar
+        """
+        if word in self.words or any(
+            pattern.fullmatch(word) for pattern in self.patterns
+        ):
+            return True
+
+        # Tokens are not necessarily separated by whitespace
+        ends = {0}
+        for end in range(1, len(word) + 1):
+            if any(word[start:end] in self.words for start in ends):
+                ends.add(end)
+        return len(word) in ends
+
+
+# Grammars are not hashable, so vocabularies are keyed by `id()`.
+# Each entry keeps a weak reference to its grammar and is removed when the grammar is collected,
+# so an `id()` reused by another grammar never finds a stale vocabulary.
+_GRAMMAR_VOCABULARIES: Dict[
+    int, Tuple["weakref.ReferenceType[DAIDEGrammar]", DAIDEVocabulary]
+] = {}
+
+
+def _get_vocabulary(grammar: DAIDEGrammar) -> DAIDEVocabulary:
+    key = id(grammar)
+    entry = _GRAMMAR_VOCABULARIES.get(key)
+    if entry is None or entry[0]() is not grammar:
+        grammar_ref = weakref.ref(
+            grammar, lambda _: _GRAMMAR_VOCABULARIES.pop(key, None)
+        )
+        entry = (grammar_ref, DAIDEVocabulary(grammar))
+        _GRAMMAR_VOCABULARIES[key] = entry
+    return entry[1]
+
+
+def prevalidate_daide_message(
+    string: str, grammar: Optional[DAIDEGrammar] = None
+) -> bool:
+    """Cheaply rejects strings that cannot be valid DAIDE, without running the grammar.
+
+    Checks that parentheses are balanced and that every word is a token of the grammar.
+    Strings with characters other than letters, digits, parentheses and whitespace
+    (e.g., quoted text) are left to the grammar.
+
+    :param string: String to check.
+    :param grammar: DAIDE grammar to use. Defaults to complete message grammar.
+    :return: False if the string is certainly invalid DAIDE, True if it has to be parsed to tell.
+    """
+    if grammar is None:
+        grammar = get_grammar("MESSAGE_GRAMMAR")
+    if not _PLAIN_DAIDE_PATTERN.fullmatch(string):
+        return True
+
+    depth = 0
+    for char in string:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return False
+    if depth != 0:
+        return False
+
+    vocabulary = _get_vocabulary(grammar)
+    if not vocabulary.words:
+        return True
+    return all(
+        vocabulary.is_known_word(word) for word in _DAIDE_WORD_PATTERN.findall(string)
+    )
+
+
+class DAIDEParseCache:
+    """Bounded, thread-safe LRU cache of DAIDE parse results
+
+    Entries are keyed by (grammar, string) and store both the parsed `daidepp`
+    object and whether the string is valid under that grammar, so repeated
+    validity checks and parses of the same message skip the grammar entirely.
+    Grammars are not hashable, so they are identified by `id()`, and each entry keeps
+    a weak reference to its grammar to ignore entries left by a collected grammar with the same `id()`.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        """
+        :param maxsize: maximum number of parse results to keep
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[weakref.ReferenceType[DAIDEGrammar], bool, Any]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def parse(self, string: str, grammar: DAIDEGrammar) -> Tuple[bool, Any]:
+        """Parses a string, reusing a previous result if there is one.
+
+        :param string: String to parse into DAIDE.
+        :param grammar: DAIDE grammar to use.
+        :return: Whether the string is valid DAIDE and the parsed object (`None` if invalid).
+        """
+        key = (id(grammar), string)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is grammar:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        is_valid, parsed = False, None
+        if prevalidate_daide_message(string, grammar):
+            try:
+                parse_tree = grammar.parse(string)
+                is_valid, parsed = True, daide_visitor.visit(parse_tree)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+
+        with self._lock:
+            self._entries[key] = (weakref.ref(grammar), is_valid, parsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return is_valid, parsed
+
+    def clear(self) -> None:
+        """Removes all cached parse results and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: dictionary of hit/miss counters and current cache size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+DAIDE_PARSE_CACHE = DAIDEParseCache()
 
 
 def is_valid_daide_message(string: str, grammar: Optional[DAIDEGrammar] = None) -> bool:
@@ -64,15 +402,9 @@ def is_valid_daide_message(string: str, grammar: Optional[DAIDEGrammar] = None)
     :return: Whether the string is valid DAIDE or not.
     """
     if grammar is None:
-        grammar = MESSAGE_GRAMMAR
-    try:
-        parse_tree = grammar.parse(string)
-        daide_visitor.visit(parse_tree)
-    except asyncio.CancelledError:
-        raise
-    except Exception:
-        return False
-    return True
+        grammar = get_grammar("MESSAGE_GRAMMAR")
+    is_valid, _ = DAIDE_PARSE_CACHE.parse(string, grammar)
+    return is_valid
 
 
 def parse_daide(string: str) -> AnyDAIDEToken:
@@ -81,8 +413,13 @@ def parse_daide(string: str) -> AnyDAIDEToken:
     :return: Parsed DAIDE object.
     :raises ValueError: If string is invalid DAIDE.
     """
+    grammar = get_grammar("ALL_GRAMMAR")
+    is_valid, parsed = DAIDE_PARSE_CACHE.parse(string, grammar)
+    if is_valid:
+        return parsed
+    # Invalid strings are parsed again outside of the cache to report the parser's error
     try:
-        parse_tree = ALL_GRAMMAR.parse(string)
+        parse_tree = grammar.parse(string)
         return daide_visitor.visit(parse_tree)
     except asyncio.CancelledError:
         raise
@@ -123,11 +460,32 @@ def optional_AND(arrangements: Sequence[Arrangement]) -> Arrangement:
         return arrangements[0]
 
 
-def get_order_tokens(order: str) -> List[str]:
-    """Retrieves the order tokens used in an order
-    e.g. 'A PAR - MAR' would return ['A PAR', '-', 'MAR']
-    NOTE: Stolen from diplomacy_research
+class ParsedOrder(NamedTuple):
+    """Structured view of a DipNet-style order
+
+    E.g. 'A PAR S A MAR - BUR' has unit 'A PAR', unit type 'A', location 'PAR', verb 'S',
+    target unit 'A MAR', target location 'MAR' and destination 'BUR'.
     """
+
+    # Order tokens, e.g. ('A PAR', 'S', 'A MAR', '- BUR') (see `get_order_tokens`)
+    tokens: Tuple[str, ...]
+    # Acting unit, e.g. 'A PAR'
+    unit: str
+    # 'A' or 'F' ('' for orders without a unit, e.g. 'WAIVE')
+    unit_type: str
+    # Location of the acting unit, including the coast if any, e.g. 'STP/SC'
+    location: str
+    # 'H', 'S', 'C', 'B' or 'D', or '-' for moves and retreats ('' if there is none)
+    verb: str
+    # Supported or convoyed unit
+    target_unit: Optional[str]
+    # Location of the supported or convoyed unit
+    target_location: Optional[str]
+    # Destination of a move or retreat, or of the supported or convoyed move
+    destination: Optional[str]
+
+
+def _tokenize_order(order: str) -> Tuple[str, ...]:
     # We need to keep 'A', 'F', and '-' in a temporary buffer to concatenate them with the next word
     # We replace 'R' orders with '-'
     # Tokenization would be: 'A PAR S A MAR - BUR' --> 'A PAR', 'S', 'A MAR', '- BUR'
@@ -138,7 +496,56 @@ def get_order_tokens(order: str) -> List[str]:
         if word not in {"A", "F", "-"}:
             order_tokens.append(" ".join(buffer))
             buffer = []
-    return order_tokens
+    return tuple(order_tokens)
+
+
+@lru_cache(maxsize=4096)
+def parse_order(order: str) -> ParsedOrder:
+    """Parses a DipNet-style order into a `ParsedOrder`
+
+    Results are memoized, as the same orders are inspected many times per phase.
+
+    :param order: DipNet-style order, e.g. 'A PAR S A MAR - BUR'
+    :return: parsed order
+    """
+    tokens = _tokenize_order(order)
+    unit = tokens[0] if tokens else ""
+    unit_parts = unit.split()
+    if len(unit_parts) >= 2:
+        unit_type, location = unit_parts[0], unit_parts[1]
+    else:
+        unit_type, location = "", unit
+
+    verb, target_unit, target_location, destination = "", None, None, None
+    if len(tokens) >= 2:
+        if tokens[1].startswith("- "):
+            verb = "-"
+            destination = tokens[1].split()[-1]
+        else:
+            verb = tokens[1]
+            if verb in {"S", "C"} and len(tokens) >= 3:
+                target_unit = tokens[2]
+                target_location = target_unit.split()[-1]
+                if len(tokens) >= 4 and tokens[3].startswith("- "):
+                    destination = tokens[3].split()[-1]
+    return ParsedOrder(
+        tokens,
+        unit,
+        unit_type,
+        location,
+        verb,
+        target_unit,
+        target_location,
+        destination,
+    )
+
+
+def get_order_tokens(order: str) -> List[str]:
+    """Retrieves the order tokens used in an order
+    e.g. 'A PAR - MAR' would return ['A PAR', '-', 'MAR']
+    NOTE: Stolen from diplomacy_research
+    """
+    return list(parse_order(order).tokens)
 
 
 def get_other_powers(powers: List[str], game: Game) -> Set[str]:
@@ -166,12 +573,27 @@ def parse_arrangement(msg: str) -> List[str]:
     :param xdo_only: flag indicating if subarrangement type should be included in the return structure
     :return: parsed subarrangements
     """
-    parsed_msg = parse_daide(msg)
-    if isinstance(parsed_msg.arrangement, (daidepp.AND, daidepp.ORR)):
-        daide_style_orders = parsed_msg.arrangement.arrangements
+    return [str(o) for o in iter_sub_arrangements(parse_daide(msg).arrangement)]
+
+
+def iter_sub_arrangements(arrangement: Arrangement) -> Iterator[Arrangement]:
+    """
+    Iterates over the already parsed subarrangements of an arrangement, without converting them back to strings
+
+    E.g.
+    ORR (XDO ((RUS FLT BLA) MTO CON)) (ALY (GER RUS TUR) VSS (FRA ENG ITA AUS))
+            -> XDO(...), ALYVSS(...)
+    XDO ((RUS FLT BLA) MTO CON) -> XDO(...)
+
+    Only the outermost AND/ORR is unpacked: nested bundles are yielded whole.
+
+    :param arrangement: arrangement of a parsed message (e.g., `PRP.arrangement`)
+    :return: generator of subarrangements
+    """
+    if isinstance(arrangement, (daidepp.AND, daidepp.ORR)):
+        yield from arrangement.arrangements
     else:
-        daide_style_orders = [parsed_msg.arrangement]
-    return [str(o) for o in daide_style_orders]
+        yield arrangement
 
 
 def parse_alliance_proposal(msg: ALYVSS, recipient: str) -> List[str]:
@@ -222,10 +644,10 @@ def is_order_aggressive(order: str, sender: str, game: Game) -> bool:
     :param order: A string order, e.g. "A BUD S F TRI"
     NOTE: Adapted directly from Joy's code
     """
-    order_token = get_order_tokens(order)
-    if order_token[0].startswith("A") or order_token[0].startswith("F"):
-        # get location - add order_token[0] ('A' or 'F') at front to check if it collides with other powers' units
-        order_unit = order_token[0][0] + order_token[1][1:]
+    parsed_order = parse_order(order)
+    if parsed_order.unit_type in {"A", "F"} and parsed_order.verb == "-":
+        # get destination - add the unit type ('A' or 'F') at front to check if it collides with other powers' units
+        order_unit = f"{parsed_order.unit_type} {parsed_order.destination}"
         # check if loc has some units of other powers on
         for power in game.powers:
             if sender != power and order_unit in game.powers[power].units:
@@ -241,29 +663,273 @@ def get_non_aggressive_orders(orders: List[str], sender: str, game: Game) -> Lis
 
 
 def get_province_from_order(order: str) -> str:
-    order_tokens = get_order_tokens(order)
-    parts = order_tokens[0].split()
-    if len(parts) >= 2:
-        return parts[1]
-    else:
-        return order_tokens[0]
+    return parse_order(order).location
+
+
+def get_game_state_key(game: Game) -> Tuple:
+    """
+    :return: hashable summary of the game's position (map, phase, units, centers and retreats).
+        Copies of a game in the same position have the same key.
+    """
+    return (
+        game.map_name,
+        game.get_current_phase(),
+        tuple(
+            (
+                power_name,
+                tuple(sorted(power.units)),
+                tuple(sorted(power.centers)),
+                tuple(
+                    (unit, tuple(locs)) for unit, locs in sorted(power.retreats.items())
+                ),
+            )
+            for power_name, power in sorted(game.powers.items())
+        ),
+    )
+
+
+class GameStateCache:
+    """Bounded, thread-safe LRU cache of values derived from game positions
+
+    Values are keyed by `get_game_state_key`, so they are shared by copies of the same
+    position and recomputed as soon as the phase or units change.
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        """
+        :param maxsize: maximum number of values to keep
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, Tuple], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, game: Game, name: str, compute: Callable[[Game], T]) -> T:
+        """Gets a value derived from the game's position, computing it if needed
+
+        :param game: game to derive the value from
+        :param name: name of the value, unique for each `compute` function
+        :param compute: function deriving the value from the game
+        :return: cached or newly computed value
+        """
+        key = (name, get_game_state_key(game))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute(game)
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Removes all cached values and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: dictionary of hit/miss counters and current cache size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+GAME_STATE_CACHE = GameStateCache()
+
+
+def _build_unit_power_index(game: Game) -> Dict[str, str]:
+    return {
+        unit: power_name[:3]
+        for power_name, units in game.get_units().items()
+        for unit in units
+    }
+
+
+def get_unit_power_index(game: Game) -> Dict[str, str]:
+    """
+    E.g. (for initial game state)
+    {"A BUD": "AUS", "F TRI": "AUS", ..., "A PAR": "FRA", ...}
+
+    :param game: game instance
+    :return: dictionary of unit -> abbreviated name of the power owning it.
+        Dislodged units are prefixed by "*". Cached per position, so it must not be mutated.
+    """
+    return GAME_STATE_CACHE.get(game, "unit_power_index", _build_unit_power_index)
+
+
+def get_all_possible_orders(game: Game) -> Dict[str, List[str]]:
+    """
+    Cached `Game.get_all_possible_orders`
+
+    :param game: game instance
+    :return: dictionary of location -> list of possible orders.
+        Cached per position, so it must not be mutated.
+    """
+    return GAME_STATE_CACHE.get(
+        game, "all_possible_orders", lambda game: game.get_all_possible_orders()
+    )
+
+
+def get_orderable_locations(game: Game, power_name: str) -> List[str]:
+    """
+    Cached `Game.get_orderable_locations` for a single power
+
+    :param game: game instance
+    :param power_name: name of the power
+    :return: sorted list of locations requiring an order from the power.
+        Cached per position, so it must not be mutated.
+    """
+    return GAME_STATE_CACHE.get(
+        game,
+        f"orderable_locations/{power_name}",
+        lambda game: game.get_orderable_locations(power_name),
+    )
+
+
+def get_possible_orders_set(game: Game, power_name: str) -> FrozenSet[str]:
+    """
+    Gets every order the power could submit in the current phase, for constant-time validity checks
+
+    :param game: game instance
+    :param power_name: name of the power
+    :return: set of the possible orders for the orderable locations of the power
+    """
+
+    def build_possible_orders_set(game: Game) -> FrozenSet[str]:
+        all_possible_orders = get_all_possible_orders(game)
+        return frozenset(
+            order
+            for loc in get_orderable_locations(game, power_name)
+            for order in all_possible_orders.get(loc, [])
+        )
+
+    return GAME_STATE_CACHE.get(
+        game, f"possible_orders_set/{power_name}", build_possible_orders_set
+    )
+
+
+def _build_support_index(game: Game) -> Dict[str, List[Tuple[str, str]]]:
+    support_index = defaultdict(list)
+    for loc, orders in get_all_possible_orders(game).items():
+        for order in orders:
+            parsed_order = parse_order(order)
+            if parsed_order.verb == "S" and 3 <= len(parsed_order.tokens) <= 4:
+                support_index[" ".join(parsed_order.tokens[2:])].append((loc, order))
+    return dict(support_index)
+
+
+def get_support_index(game: Game) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Indexes the possible support orders of all units by the order they support.
+    Support moves are keyed by the supported move and support holds by the supported unit.
+
+    E.g. (for initial game state)
+    {"A MUN - BUR": [("MAR", "A MAR S A MUN - BUR"), ("PAR", "A PAR S A MUN - BUR")], ..., "A PAR": [...], ...}
+
+    :param game: game instance
+    :return: dictionary of supported order -> list of (location of the supporting unit, support order).
+        Cached per position, so it must not be mutated.
+    """
+    return GAME_STATE_CACHE.get(game, "support_index", _build_support_index)
 
 
 class MessagesData(collections.abc.Collection):
+    """Messages as {"recipient": ..., "message": ...} dictionaries, in the order they were added
+
+    Messages are indexed by (recipient, message) pair, by recipient and by DAIDE keyword
+    (e.g., "FCT" or "PRP"), so lookups do not scan all messages.
+    Messages must be added with `add_message` for the indexes to stay consistent.
+    """
+
+    __slots__ = (
+        "messages",
+        "_pairs",
+        "_by_recipient",
+        "_by_keyword",
+        "_keyed_recipients",
+    )
+
     def __init__(self):
-        self.messages = []
+        self.messages: List[Dict[str, str]] = []
+        self._pairs: Set[Tuple[str, str]] = set()
+        self._by_recipient: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        self._by_keyword: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        self._keyed_recipients: Set[Tuple[str, str]] = set()
+
+    @staticmethod
+    def get_keyword(message: str) -> str:
+        """
+        :param message: DAIDE message
+        :return: leading press keyword of the message (e.g., "FCT" for "FCT (XDO ...)")
+        """
+        return message[:3]
 
     def add_message(
         self, recipient: str, message: str, allow_duplicates: bool = True
     ) -> bool:
-        pair = {"recipient": recipient, "message": message}
-        message_already_exists = pair in self
+        pair = (recipient, message)
+        message_already_exists = pair in self._pairs
         if allow_duplicates or not message_already_exists:
-            self.messages.append(pair)
+            msg = {"recipient": recipient, "message": message}
+            keyword = self.get_keyword(message)
+            self.messages.append(msg)
+            self._pairs.add(pair)
+            self._by_recipient[recipient].append(msg)
+            self._by_keyword[keyword].append(msg)
+            self._keyed_recipients.add((recipient, keyword))
         return message_already_exists
 
+    def has_message(self, recipient: str, keyword: Optional[str] = None) -> bool:
+        """
+        :param recipient: recipient of the message
+        :param keyword: if given, only messages starting with this press keyword (e.g., "FCT") are considered
+        :return: whether a message has been added for the recipient
+        """
+        if keyword is None:
+            return bool(self._by_recipient.get(recipient))
+        return (recipient, keyword) in self._keyed_recipients
+
+    def get_messages(
+        self, recipient: Optional[str] = None, keyword: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        :param recipient: if given, only messages to this recipient are returned
+        :param keyword: if given, only messages starting with this press keyword (e.g., "FCT") are returned
+        :return: messages in the order they were added
+        """
+        if recipient is None and keyword is None:
+            return list(self.messages)
+        if keyword is None:
+            return list(self._by_recipient.get(recipient, []))
+        by_keyword = self._by_keyword.get(keyword, [])
+        if recipient is None:
+            return list(by_keyword)
+        return [msg for msg in by_keyword if msg["recipient"] == recipient]
+
     def __contains__(self, item):
-        return item in self.messages
+        if not isinstance(item, collections.abc.Mapping) or len(item) != 2:
+            return False
+        return (item.get("recipient"), item.get("message")) in self._pairs
 
     def __iter__(self):
         return iter(self.messages)
@@ -276,8 +942,22 @@ class MessagesData(collections.abc.Collection):
 
 
 class OrdersData:
+    """Orders of a power, at most one per location
+
+    Orders are indexed by the location of the ordering unit (including the coast, e.g. 'STP/SC').
+    The sorted list of orders is kept between changes, so iterating is cheap.
+    """
+
+    __slots__ = ("_orders", "_sorted_orders")
+
     def __init__(self) -> None:
-        self.orders: Dict[str, str] = defaultdict(str)
+        self._orders: Dict[str, str] = {}
+        self._sorted_orders: Optional[List[str]] = []
+
+    @property
+    def orders(self) -> Mapping[str, str]:
+        """Read-only dictionary of location -> order"""
+        return MappingProxyType(self._orders)
 
     def add_order(self, order: str) -> None:
         """
@@ -285,29 +965,71 @@ class OrdersData:
 
         :param order: order to add
         """
-        province = get_province_from_order(order)
-        self.orders[province] = order
+        self._set_order(parse_order(order).location, order)
 
-    def add_orders(self, orders: Sequence[str]) -> None:
+    def add_orders(
+        self,
+        orders: Sequence[str],
+        parsed_orders: Optional[Sequence[ParsedOrder]] = None,
+    ) -> None:
         """
         Adds multiple orders
 
         :param orders: orders to add
+        :param parsed_orders: the orders already parsed by `parse_order`, in the same order, to avoid parsing them again
+        :raises ValueError: If `parsed_orders` and `orders` have different lengths.
         """
-        for order in orders:
-            self.add_order(order)
+        if parsed_orders is None:
+            parsed_orders = [parse_order(order) for order in orders]
+        elif len(parsed_orders) != len(orders):
+            raise ValueError(
+                f"Got {len(parsed_orders)} parsed orders for {len(orders)} orders"
+            )
+        for order, parsed_order in zip(orders, parsed_orders):
+            self._set_order(parsed_order.location, order)
+
+    def _set_order(self, location: str, order: str) -> None:
+        if self._orders.get(location) != order:
+            self._orders[location] = order
+            self._sorted_orders = None
+
+    def diff(
+        self, other: "OrdersData"
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """
+        E.g. {"PAR": ("A PAR H", "A PAR - BUR"), "MAR": (None, "A MAR H")}
+
+        :param other: previous orders
+        :return: dictionary of location -> (order in `other`, order in self) for the locations whose order differs
+        """
+        return {
+            location: (other._orders.get(location), self._orders.get(location))
+            for location in self._orders.keys() | other._orders.keys()
+            if other._orders.get(location) != self._orders.get(location)
+        }
+
+    def copy(self) -> "OrdersData":
+        """
+        :return: copy of the orders, which can be changed independently
+        """
+        orders_data = OrdersData()
+        orders_data._orders = dict(self._orders)
+        orders_data._sorted_orders = self._sorted_orders
+        return orders_data
 
     def __iter__(self) -> Iterator[str]:
-        return iter(sorted(self.orders.values()))
+        if self._sorted_orders is None:
+            self._sorted_orders = sorted(self._orders.values())
+        return iter(self._sorted_orders)
 
     def __len__(self) -> int:
-        return len(self.orders)
+        return len(self._orders)
 
     def __bool__(self) -> bool:
-        return bool(self.orders)
+        return bool(self._orders)
 
     def __repr__(self) -> str:
-        contents = dict(sorted(self.orders.items()))
+        contents = dict(sorted(self._orders.items()))
         return f"{self.__class__.__name__}({contents})"
 
     def __str__(self) -> str:
@@ -345,6 +1067,210 @@ def deepcopy_game(game: Game) -> Game:
     return result
 
 
+# History of finished phases grows every phase but is never modified afterwards,
+# so game snapshots share the entries instead of deep copying them
+GAME_HISTORY_ATTRIBUTES = {
+    "message_history",
+    "messages",
+    "order_history",
+    "result_history",
+    "state_history",
+}
+# Derived from the map once and only ever replaced, never modified in place
+GAME_SHARED_ATTRIBUTES = {"convoy_paths_dest", "convoy_paths_possible"}
+
+
+def snapshot_game(game: Game) -> Game:
+    """Copies a game for rollouts, sharing the history of previous phases
+
+    Unlike `deepcopy_game`, only the current phase's state (units, centers, influence,
+    orders and phase data) is deep copied. History containers are copied shallowly,
+    so processing the snapshot does not affect the original game, and the cost of
+    a snapshot does not grow as the game goes on.
+
+    :param game: game to copy
+    :return: copy of the game that can be processed independently
+    """
+    if game.__class__.__name__ != "Game":
+        cls = list(game.__class__.__bases__)[0]
+        result = cls.__new__(cls)
+    else:
+        cls = game.__class__
+        result = cls.__new__(cls)
+
+    for key in game._slots:
+        if key in [
+            "map",
+            "renderer",
+            "powers",
+            "channel",
+            "notification_callbacks",
+            "data",
+            "__weakref__",
+        ]:
+            continue
+        value = getattr(game, key)
+        if key in GAME_HISTORY_ATTRIBUTES:
+            value = value.copy()
+        elif key == "_unit_owner_cache":
+            # Rebuilt on demand from the copied units
+            value = None
+        elif key not in GAME_SHARED_ATTRIBUTES:
+            value = deepcopy(value)
+        setattr(result, key, value)
+    result.map = game.map
+    result.powers = {}
+    for power in game.powers.values():
+        result.powers[power.name] = deepcopy(power)
+        result.powers[power.name].game = result
+    result.role = strings.SERVER_TYPE
+    return result
+
+
+# Phases of history kept by game forks. A full game year covers the
+# previous movement phase that DipNet uses as input.
+FORK_HISTORY_LENGTH = 5
+
+
+class GameForker:
+    """Produces cheap copies of a game for evaluating several proposals from the same state
+
+    The game is copied once with `snapshot_game` and its history is trimmed to the
+    most recent phases. Each fork then only copies that base's current-phase state
+    and a few history entries, so evaluating N proposals costs one heavy copy plus N light ones.
+    A forker can be kept for as long as `is_current` holds, i.e. for the whole phase.
+    """
+
+    def __init__(self, game: Game, history_length: int = FORK_HISTORY_LENGTH) -> None:
+        """
+        :param game: game to fork
+        :param history_length: number of most recent phases of history kept in forks
+        """
+        self.state_key = get_game_state_key(game)
+        self.base = snapshot_game(game)
+        for key in GAME_HISTORY_ATTRIBUTES - {"messages"}:
+            history = getattr(self.base, key)
+            if len(history) > history_length:
+                history.remove_sub(
+                    key_to=history.key_from_index(len(history) - history_length - 1)
+                )
+
+    def is_current(self, game: Game) -> bool:
+        """
+        :return: whether the forks still match the game's current position
+        """
+        return get_game_state_key(game) == self.state_key
+
+    def fork(self) -> Game:
+        """
+        :return: copy of the game that can be processed independently
+        """
+        return snapshot_game(self.base)
+
+
+def get_game_forker(bot: "DipnetBot") -> GameForker:
+    """
+    Gets a forker of the bot's game, reusing the bot's `game_forker` while it is current
+
+    :param bot: bot evaluating proposals. If it has a `game_forker` attribute, the forker is stored there.
+    :return: forker of the bot's game in its current position
+    """
+    forker: Optional[GameForker] = getattr(bot, "game_forker", None)
+    if forker is None or not forker.is_current(bot.game):
+        forker = GameForker(bot.game)
+        if hasattr(bot, "game_forker"):
+            bot.game_forker = forker
+    return forker
+
+
+class RolloutCache:
+    """Per-phase cache of rollout values
+
+    Entries are keyed by the position being simulated and the joint orders of every power,
+    so proposals that reduce to the same orders (e.g., after censoring aggressive orders,
+    or a proposal equal to the bot's own orders) are only rolled out once.
+    Concurrent lookups of the same key share a single rollout.
+    """
+
+    def __init__(self) -> None:
+        self.phase: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self._values: Dict[Tuple, "asyncio.Future[float]"] = {}
+
+    @staticmethod
+    def make_key(
+        game: Game, joint_orders: Dict[str, List[str]], params: Tuple = ()
+    ) -> Tuple:
+        """
+        Builds a canonical key for a rollout
+
+        :param game: game before the orders are processed
+        :param joint_orders: dictionary of power name -> orders for every power
+        :param params: rollout parameters that affect the value
+        :return: hashable key that does not depend on the order of powers or orders
+        """
+        return (
+            game.get_current_phase(),
+            tuple(
+                sorted(
+                    (power, tuple(sorted(units)))
+                    for power, units in game.get_units().items()
+                )
+            ),
+            tuple(
+                sorted(
+                    (power, tuple(sorted(orders)))
+                    for power, orders in joint_orders.items()
+                )
+            ),
+            params,
+        )
+
+    def start_phase(self, phase: str) -> None:
+        """Clears the cache and its counters if the phase changed"""
+        if phase != self.phase:
+            self.phase = phase
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+
+    async def get_value(
+        self, key: Tuple, compute: Callable[[], Awaitable[float]]
+    ) -> float:
+        """
+        Gets a cached rollout value, computing it if needed
+
+        :param key: key from `make_key`
+        :param compute: coroutine function performing the rollout
+        :return: rollout value
+        """
+        future = self._values.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+        self.misses += 1
+
+        future = asyncio.get_event_loop().create_future()
+        self._values[key] = future
+        try:
+            value = await compute()
+        except BaseException:
+            # Failed rollouts are not cached; lookups waiting on this one fail too
+            if self._values.get(key) is future:
+                del self._values[key]
+            future.cancel()
+            raise
+        future.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: dictionary of hit/miss counters and current cache size
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._values)}
+
+
 async def get_state_value(
     bot: "DipnetBot", game: Game, power_name: Optional[str], option: str = "default"
 ) -> int:
@@ -356,23 +1282,30 @@ async def get_state_value(
     for i in range(3 * rollout_length):
         if game.get_current_phase().endswith("M"):
             movement_phase += 1
-        for power in game.map.powers:
-            if option == "samplingbeam":
-                list_order, prob_order = await bot.get_brain_beam_orders(game, power)
-
+        if option == "samplingbeam":
+            beam_orders = await bot.get_brain_beam_orders_all_powers(
+                game, game.map.powers
+            )
+            powers_orders = {}
+            for power, (list_order, prob_order) in beam_orders.items():
                 if len(list_order) > 0:
                     prob_order = np.array(prob_order)
                     prob_order /= prob_order.sum()
                     orders_index = [i for i in range(len(list_order))]
                     select_index = np.random.choice(orders_index, p=prob_order)
-                    orders = list_order[select_index]
-                else:
-                    orders = await bot.get_brain_orders(game, power)
-            elif option == "default":
-                orders = await bot.get_brain_orders(game, power)
-            else:
-                raise ValueError(f"invalid option {option!r}")
+                    powers_orders[power] = list_order[select_index]
+            missing_powers = [
+                power for power in game.map.powers if power not in powers_orders
+            ]
+            powers_orders.update(
+                await bot.get_brain_orders_all_powers(game, missing_powers)
+            )
+        elif option == "default":
+            powers_orders = await bot.get_brain_orders_all_powers(game, game.map.powers)
+        else:
+            raise ValueError(f"invalid option {option!r}")
 
+        for power, orders in powers_orders.items():
             game.set_orders(
                 power_name=power,
                 orders=orders[: min(rollout_n_order, len(orders))],
@@ -387,10 +1320,242 @@ async def get_state_value(
     )
 
 
+# Number of standard errors used for rollout confidence intervals (~95%)
+ROLLOUT_CONFIDENCE_Z = 1.96
+# Samples per proposal needed before trusting the intervals to stop sampling early
+ROLLOUT_MIN_SAMPLES_TO_STOP = 4
+
+
+class ProposalEvaluation(NamedTuple):
+    """Outcome of simulating a single proposal"""
+
+    proposer: str
+    orders: List[str]
+    # Mean state value over the rollouts
+    value: float
+    # Seconds spent simulating the proposal, summed over the rollouts
+    elapsed: float
+    # Sample variance of the state values
+    variance: float = 0.0
+    n_samples: int = 1
+
+    def confidence_interval(
+        self, z: float = ROLLOUT_CONFIDENCE_Z
+    ) -> Tuple[float, float]:
+        """
+        :param z: number of standard errors on each side of the mean
+        :return: lower and upper bounds of the confidence interval on the mean state value
+        """
+        half_width = z * float(np.sqrt(self.variance / self.n_samples))
+        return self.value - half_width, self.value + half_width
+
+
+async def simulate_proposal(
+    bot: "DipnetBot",
+    unit_orders: List[str],
+    shared_order: Dict[str, List[str]],
+    forker: Optional[GameForker] = None,
+    sample: int = 0,
+) -> float:
+    """
+    Simulates the current turn with the proposed orders and rolls out the resulting game
+
+    If the bot has a `rollout_cache`, rollouts of joint orders already simulated this phase are reused.
+
+    :param bot: bot evaluating the proposal
+    :param unit_orders: proposed orders for the bot's power
+    :param shared_order: dictionary of power name -> orders that power said it would execute
+    :param forker: forker of the bot's game to copy the game from. If `None`, the game is snapshotted directly.
+    :param sample: index of the rollout when sampling the same proposal several times
+    :return: state value of the bot's power after the rollout
+    """
+    # simulate game by copying the current one
+    if forker is not None:
+        simulated_game = forker.fork()
+    else:
+        simulated_game = snapshot_game(bot.game)
+
+    # censor aggressive orders
+    unit_orders = get_non_aggressive_orders(unit_orders, bot.power_name, bot.game)
+
+    # set orders as a proposal order
+    simulated_game.set_orders(power_name=bot.power_name, orders=unit_orders)
+
+    # consider shared orders in a simulated game
+    # if they are not sharing any info about their orders then assume that they are DipNet-based
+    dipnet_orders = await bot.get_brain_orders_all_powers(
+        simulated_game,
+        [power for power in simulated_game.powers if power not in shared_order],
+    )
+    joint_orders = {}
+    for other_power in simulated_game.powers:
+        if other_power in shared_order:
+            power_orders = shared_order[other_power]
+        else:
+            power_orders = dipnet_orders[other_power]
+        simulated_game.set_orders(power_name=other_power, orders=power_orders)
+        joint_orders[other_power] = power_orders
+
+    async def rollout() -> float:
+        # process current turn
+        simulated_game.process()
+
+        # rollout and get state value
+        return await get_state_value(bot, simulated_game, bot.power_name)
+
+    rollout_cache: Optional[RolloutCache] = getattr(bot, "rollout_cache", None)
+    if rollout_cache is None:
+        return await rollout()
+    rollout_cache.start_phase(bot.game.get_current_phase())
+    key = RolloutCache.make_key(
+        bot.game,
+        joint_orders,
+        (
+            getattr(bot, "rollout_length", 1),
+            getattr(bot, "rollout_n_order", 1),
+            sample,
+        ),
+    )
+    return await rollout_cache.get_value(key, rollout)
+
+
+async def evaluate_proposals(
+    bot: "DipnetBot",
+    proposal_order: Dict[str, List[str]],
+    shared_order: Dict[str, List[str]],
+    max_concurrency: Optional[int] = None,
+    n_samples: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> Dict[str, ProposalEvaluation]:
+    """
+    Estimates the state value of each proposal with Monte-Carlo rollouts
+
+    Rollouts run concurrently, which lets the model server batch the order requests they make.
+    With several samples per proposal, sampling proceeds in rounds (successive halving):
+    after each round, sampling stops if the best proposal's confidence interval lies above
+    every other's, and otherwise only the better half of the proposals is sampled further,
+    with twice as many rollouts as in the previous round.
+
+    With a deadline, rounds continue past `n_samples` until one proposal dominates
+    or the deadline is reached, and halving always keeps the best two proposals,
+    so that the remaining time is spent telling them apart. At the deadline, the rollouts
+    in progress are cancelled and the estimates from the samples gathered so far are returned.
+
+    :param bot: bot evaluating the proposals
+    :param proposal_order: dictionary of proposer -> proposed orders
+    :param shared_order: dictionary of power name -> orders that power said it would execute
+    :param max_concurrency: maximum number of rollouts run at once.
+        Defaults to the bot's `max_concurrent_rollouts` attribute (unbounded if missing or `None`).
+    :param n_samples: maximum number of rollouts per proposal.
+        Defaults to the bot's `rollout_n_samples` attribute (1 if missing).
+        Ignored if there is a deadline.
+    :param deadline: event loop time (see `asyncio.AbstractEventLoop.time()`) by which to return
+    :return: dictionary of proposer -> evaluation, for each proposer with at least one order
+        and one finished rollout. Proposals dropped in an earlier round have fewer samples than the finalists.
+    """
+    if max_concurrency is None:
+        max_concurrency = getattr(bot, "max_concurrent_rollouts", None)
+    if n_samples is None:
+        n_samples = getattr(bot, "rollout_n_samples", 1)
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    # all proposals start from the same state, so the game is only copied in full once per position
+    forker = get_game_forker(bot)
+
+    # only evaluate powers that sent a proposal
+    remaining = [proposer for proposer, orders in proposal_order.items() if orders]
+    values: Dict[str, List[float]] = {proposer: [] for proposer in remaining}
+    elapsed: Dict[str, float] = {proposer: 0.0 for proposer in remaining}
+
+    def evaluation(proposer: str) -> ProposalEvaluation:
+        samples = values[proposer]
+        return ProposalEvaluation(
+            proposer,
+            proposal_order[proposer],
+            float(np.mean(samples)),
+            elapsed[proposer],
+            float(np.var(samples, ddof=1)) if len(samples) > 1 else 0.0,
+            len(samples),
+        )
+
+    async def sample(proposer: str, index: int) -> None:
+        if semaphore is not None:
+            await semaphore.acquire()
+        try:
+            start_time = time.perf_counter()
+            value = await simulate_proposal(
+                bot, proposal_order[proposer], shared_order, forker, index
+            )
+            elapsed[proposer] += time.perf_counter() - start_time
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        values[proposer].append(value)
+
+    async def run_round(start: int, end: int) -> bool:
+        """
+        :return: whether the round finished before the deadline
+        """
+        samples = [
+            sample(proposer, index)
+            for proposer in remaining
+            for index in range(start, end)
+        ]
+        if deadline is None:
+            await asyncio.gather(*samples)
+            return True
+
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in samples]
+        timeout = max(deadline - asyncio.get_event_loop().time(), 0)
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            # propagate errors from the rollouts
+            task.result()
+        return not pending
+
+    # two samples are needed to estimate the variance
+    round_size = 2 if deadline is not None else min(2, n_samples)
+    while remaining:
+        start = len(values[remaining[0]])
+        end = start + round_size
+        if deadline is None:
+            end = min(end, n_samples)
+        if not await run_round(start, end):
+            # keep the same number of samples for every finalist
+            finished = [len(values[proposer]) for proposer in remaining]
+            n_finished = min((n for n in finished if n), default=0)
+            for proposer in remaining:
+                del values[proposer][n_finished:]
+            break
+        if (deadline is None and end >= n_samples) or len(remaining) == 1:
+            break
+
+        ranked = sorted(remaining, key=lambda p: np.mean(values[p]), reverse=True)
+        best_lower, _ = evaluation(ranked[0]).confidence_interval()
+        if end >= ROLLOUT_MIN_SAMPLES_TO_STOP and all(
+            evaluation(proposer).confidence_interval()[1] < best_lower
+            for proposer in ranked[1:]
+        ):
+            # the best proposal clearly dominates
+            break
+        n_kept = (len(ranked) + 1) // 2
+        if deadline is not None:
+            n_kept = max(n_kept, 2)
+        remaining = ranked[:n_kept]
+        if len(remaining) == 1:
+            break
+        round_size *= 2
+
+    return {proposer: evaluation(proposer) for proposer in values if values[proposer]}
+
+
 async def get_best_orders(
     bot: "DipnetBot",
     proposal_order: Dict[str, List[str]],
     shared_order: Dict[str, List[str]],
+    deadline: Optional[float] = None,
 ) -> Tuple[str, List[str]]:
     """
     input:
@@ -399,6 +1564,8 @@ async def get_best_orders(
                         i.e. if a bot is RealPolitik, its base order is from DipNet
         shared_order: a dictionary of key=power name of proposer, value=list of orders. The proposers share info (or orders) about the current turn,
                     where we can use these shared order to our current turn in a simulated game to roll out with most correct info.
+        deadline: event loop time until which to keep refining the estimates (see `evaluate_proposals`).
+                  If no proposal could be evaluated by then, the bot's own orders are kept.
     output:
         best_proposer: best power that propose the best orders to a bot, this can be itself
         proposal_order[best_proposer]: the orders from the best proposer
@@ -407,38 +1574,24 @@ async def get_best_orders(
     state_value = {power: float("-inf") for power in bot.game.powers}
 
     # get state value for each proposal
-    for proposer, unit_orders in proposal_order.items():
-        # if there is a proposal from this power
-        if unit_orders:
-            # simulate game by copying the current one
-            simulated_game = deepcopy_game(bot.game)
-
-            # censor aggressive orders
-            unit_orders = get_non_aggressive_orders(
-                unit_orders, bot.power_name, bot.game
-            )
-
-            # set orders as a proposal order
-            simulated_game.set_orders(power_name=bot.power_name, orders=unit_orders)
-
-            # consider shared orders in a simulated game
-            for other_power in simulated_game.powers:
-                # if they are not sharing any info about their orders then assume that they are DipNet-based
-                if other_power in shared_order:
-                    power_orders = shared_order[other_power]
-                else:
-                    power_orders = await bot.get_brain_orders(
-                        simulated_game, other_power
-                    )
-                simulated_game.set_orders(power_name=other_power, orders=power_orders)
-
-            # process current turn
-            simulated_game.process()
-
-            # rollout and get state value
-            state_value[proposer] = await get_state_value(
-                bot, simulated_game, bot.power_name
-            )
+    evaluations = await evaluate_proposals(
+        bot, proposal_order, shared_order, deadline=deadline
+    )
+    if not evaluations and bot.power_name in proposal_order:
+        return bot.power_name, proposal_order[bot.power_name]
+    most_samples = max(
+        (evaluation.n_samples for evaluation in evaluations.values()), default=0
+    )
+    for proposer, evaluation in evaluations.items():
+        lower, upper = evaluation.confidence_interval()
+        print(
+            f"Evaluated proposal from {proposer} in {evaluation.elapsed:0.4}s "
+            f"(state value: {evaluation.value:0.3} in [{lower:0.3}, {upper:0.3}] "
+            f"over {evaluation.n_samples} rollout(s))"
+        )
+        # proposals dropped before the last round of sampling are not candidates
+        if evaluation.n_samples == most_samples:
+            state_value[proposer] = evaluation.value
 
     # get power name that gives the max state value
     best_proposer = max(state_value, key=state_value.get)
@@ -475,14 +1628,13 @@ def neighboring_opps(
     opponents: List[str],
 ) -> List[str]:
     """Return a list of powers that are neighbors of power_name"""
-    neighbors = set()  # set to prevent duplicates
-    adj_provs = set()  # provs adjacent to power_name territories
-    for prov in game.powers[power_name].influence:
-        adj_provs.update(set(x.upper() for x in game.map.abut_list(prov)))
-
-    for opponent in opponents:
-        for prov in game.powers[opponent].influence:
-            if prov in adj_provs:
-                neighbors.add(opponent)
-                break
-    return sorted(neighbors)
+    graph = get_map_graph(game.map)
+    # provs adjacent to power_name territories
+    adj_provs = graph.neighbors_mask(graph.mask(game.powers[power_name].influence))
+    return sorted(
+        set(
+            opponent
+            for opponent in opponents
+            if (graph.mask(game.powers[opponent].influence) & adj_provs).any()
+        )
+    )
@@ -1,12 +1,15 @@
 """unit tests for bots"""
+from diplomacy import Game, Message
 from gameplay_framework import GamePlay
 from tornado.testing import AsyncTestCase, gen_test
 
+from baseline_bots.bots.baseline_bot import BaselineBot, SendOutcome
 from baseline_bots.bots.no_press_bot import NoPressDipBot
 from baseline_bots.bots.pushover_bot import PushoverDipnet
 from baseline_bots.bots.random_proposer_bot import RandomProposerBot
 from baseline_bots.bots.selectively_transparent_bot import SelectivelyTransparentBot
 from baseline_bots.bots.transparent_bot import TransparentBot
+from baseline_bots.utils import MessagesData
 
 
 class TestOtherBots(AsyncTestCase):
@@ -36,3 +39,122 @@ class TestOtherBots(AsyncTestCase):
     def test_random_proposer_vs_random_proposer(self):
         game_play = GamePlay(None, [RandomProposerBot, RandomProposerBot], 3, True)
         yield game_play.play()
+
+
+class InboxBot(BaselineBot):
+    def __call__(self):
+        return []
+
+
+class TestInbox(AsyncTestCase):
+    @gen_test
+    def test_read_messages_incrementally(self):
+        game = Game()
+        bot = InboxBot("FRANCE", game)
+
+        def add_message(sender: str, message: str) -> None:
+            game.add_message(
+                Message(
+                    sender=sender,
+                    recipient=bot.power_name,
+                    message=message,
+                    phase=game.get_current_phase(),
+                )
+            )
+
+        add_message("ENGLAND", "PRP (PCE (ENG FRA))")
+        add_message("GERMANY", "NOT DAIDE")
+        assert [msg.sender for msg in bot.read_messages()] == ["ENGLAND"]
+        assert [msg.sender for msg in bot.new_messages] == ["ENGLAND"]
+
+        # Nothing new arrived since the last read
+        assert len(bot.read_messages()) == 1
+        assert bot.new_messages == []
+
+        add_message("ITALY", "PRP (PCE (FRA ITA))")
+        assert [msg.sender for msg in bot.read_messages()] == ["ENGLAND", "ITALY"]
+        assert [msg.sender for msg in bot.new_messages] == ["ITALY"]
+
+        # Sent messages show up in the recipient's inbox
+        other_bot = InboxBot("ENGLAND", game)
+        yield bot.send_message("ENGLAND", "PRP (PCE (ENG FRA))", MessagesData())
+        assert [msg.sender for msg in other_bot.read_messages()] == ["FRANCE"]
+
+        # The inbox is reset when the phase changes
+        game.process()
+        assert bot.read_messages() == []
+
+
+class FailingInboxBot(InboxBot):
+    failing_recipients = {"TURKEY"}
+
+    async def _deliver_message(self, msg_obj: Message) -> None:
+        if msg_obj.recipient in self.failing_recipients:
+            raise ConnectionError("Server unavailable")
+        await super()._deliver_message(msg_obj)
+
+
+class TestSendMessagesBatch(AsyncTestCase):
+    @gen_test
+    def test_send_messages_batch(self):
+        game = Game()
+        bot = FailingInboxBot("FRANCE", game)
+        msg_data = MessagesData()
+        msg_data.add_message("ENGLAND", "PRP (PCE (ENG FRA))")
+        msg_data.add_message("ENGLAND", "NOT DAIDE")
+        msg_data.add_message("ITALY", "PRP (PCE (FRA ITA))")
+        msg_data.add_message("ENGLAND", "PRP (PCE (ENG FRA ITA))")
+        msg_data.add_message("TURKEY", "PRP (PCE (FRA TUR))")
+
+        sent_msg_data = MessagesData()
+        sent_msg_data.add_message("ITALY", "PRP (PCE (FRA ITA))")
+        outcomes = yield bot.send_messages_batch(msg_data, sent_msg_data)
+        assert outcomes == [
+            SendOutcome.sent,
+            SendOutcome.invalid,
+            SendOutcome.duplicate,
+            SendOutcome.sent,
+            SendOutcome.failed,
+        ]
+        # Messages to the same recipient keep their order
+        assert [msg.message for msg in game.messages.values()] == [
+            "PRP (PCE (ENG FRA))",
+            "PRP (PCE (ENG FRA ITA))",
+        ]
+        assert {"recipient": "ENGLAND", "message": "PRP (PCE (ENG FRA))"} in (
+            sent_msg_data
+        )
+        # Failed messages are not recorded as sent, so they are retried
+        turkey_msg = {"recipient": "TURKEY", "message": "PRP (PCE (FRA TUR))"}
+        assert turkey_msg not in sent_msg_data
+
+        bot.failing_recipients = set()
+        outcomes = yield bot.send_messages_batch(msg_data, sent_msg_data)
+        assert outcomes == [
+            SendOutcome.duplicate,
+            SendOutcome.invalid,
+            SendOutcome.duplicate,
+            SendOutcome.duplicate,
+            SendOutcome.sent,
+        ]
+        assert turkey_msg in sent_msg_data
+
+    @gen_test
+    def test_send_messages_batch_duplicates(self):
+        game = Game()
+        bot = InboxBot("FRANCE", game)
+        msg_data = MessagesData()
+        msg_data.add_message("GERMANY", "PRP (PCE (FRA GER))")
+        msg_data.add_message("GERMANY", "PRP (PCE (FRA GER))")
+
+        # Without sent messages to check against, every message is sent
+        outcomes = yield bot.send_messages_batch(msg_data)
+        assert outcomes == [SendOutcome.sent, SendOutcome.sent]
+        yield bot.send_messages(msg_data)
+        assert len(game.messages) == 4
+
+        # Otherwise, duplicates within the batch are only sent once
+        sent_msg_data = MessagesData()
+        outcomes = yield bot.send_messages_batch(msg_data, sent_msg_data)
+        assert outcomes == [SendOutcome.sent, SendOutcome.duplicate]
+        assert len(game.messages) == 5
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from diplomacy import Game
+
+from baseline_bots.game_updates import GameUpdateWaiter, wait_until
+
+
+class TestGameUpdates:
+    def test_wait_until_backs_off(self):
+        checks = []
+
+        def condition() -> bool:
+            checks.append(time.perf_counter())
+            return len(checks) == 4
+
+        asyncio.run(wait_until(condition, initial_delay=0.01, max_delay=0.02))
+        gaps = [second - first for first, second in zip(checks, checks[1:])]
+        # Delays double from 0.01s up to 0.02s
+        assert len(gaps) == 3
+        assert gaps[0] >= 0.01 and gaps[1] >= 0.02 and gaps[2] >= 0.02
+
+    def test_notification_wakes_waiter(self):
+        game = Game()
+        waiter = GameUpdateWaiter(game)
+
+        async def change_phase() -> None:
+            await asyncio.sleep(0.05)
+            game.process()
+            # Stands in for the server notifying the phase update
+            waiter._on_notification(game, None)
+
+        async def run() -> float:
+            phase = game.get_current_phase()
+            start_time = time.perf_counter()
+            asyncio.ensure_future(change_phase())
+            await waiter.wait_until(
+                lambda: game.get_current_phase() != phase,
+                initial_delay=10,
+                max_delay=10,
+            )
+            return time.perf_counter() - start_time
+
+        # Without the notification, the condition would only be checked after 10s
+        assert asyncio.run(run()) < 5
@@ -0,0 +1,50 @@
+import asyncio
+from typing import List
+
+from baseline_bots.log_shipper import IntentLogShipper
+
+
+class TestIntentLogShipper:
+    def test_lines_are_coalesced(self):
+        sent_logs: List[str] = []
+
+        async def send_log(body: str) -> None:
+            sent_logs.append(body)
+
+        async def run() -> None:
+            shipper = IntentLogShipper(send_log, flush_interval=0.05)
+            shipper.submit("first")
+            shipper.submit("second")
+            await asyncio.sleep(0.1)
+            assert sent_logs == ["first\nsecond"]
+
+            shipper.submit("third")
+            # Flushing does not wait for the end of the interval
+            await shipper.flush()
+            assert sent_logs == ["first\nsecond", "third"]
+            await shipper.close()
+            assert shipper.sent == 3
+
+        asyncio.run(run())
+
+    def test_failed_and_excess_lines_are_spilled(self, tmp_path):
+        spill_path = tmp_path / "intent_logs.txt"
+
+        async def send_log(body: str) -> None:
+            raise ConnectionError("Server unavailable")
+
+        async def run() -> None:
+            shipper = IntentLogShipper(
+                send_log, flush_interval=10, max_pending=2, spill_path=str(spill_path)
+            )
+            for line in ["first", "second", "third"]:
+                shipper.submit(line)
+            # The queue only holds two lines
+            assert spill_path.read_text() == "third\n"
+
+            await shipper.close()
+            assert spill_path.read_text() == "third\nfirst\nsecond\n"
+            assert shipper.spilled == 3
+            assert shipper.sent == shipper.dropped == 0
+
+        asyncio.run(run())
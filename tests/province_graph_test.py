@@ -0,0 +1,56 @@
+from diplomacy import Game
+
+from baseline_bots.province_graph import ProvinceGraph, get_map_graph
+from baseline_bots.randomize_order import ADJACENCY, TYPES
+
+
+class TestProvinceGraph:
+    def test_graph_from_dicts(self):
+        graph = ProvinceGraph(ADJACENCY, TYPES)
+
+        # Neighbours keep the order of ADJACENCY
+        assert graph.neighbor_names("BAL") == ADJACENCY["BAL"]
+        # Coasts are separate locations belonging to their province
+        assert graph.neighbor_names("BAR") == ["NWY", "NWG", "STP/NC"]
+        assert graph.names(graph.in_provinces(graph.mask(["STP"]))) == [
+            "STP",
+            "STP/NC",
+            "STP/SC",
+        ]
+        # Lower-case keys of TYPES are normalized
+        assert graph.type_masks["COAST"][graph.index["BUL"]]
+
+        coasts_not_next_to_hol = graph.type_masks["COAST"] & ~graph.adjacent_mask("HOL")
+        assert graph.neighbor_names("NTH", coasts_not_next_to_hol) == [
+            "DEN",
+            "EDI",
+            "LON",
+            "HOL",
+            "NWY",
+            "YOR",
+        ]
+
+    def test_graph_from_map(self):
+        game = Game()
+        graph = get_map_graph(game.map)
+        assert get_map_graph(game.map) is graph
+
+        for loc in ["PAR", "STP", "STP/NC", "CON"]:
+            assert graph.names(graph.adjacent_mask(loc)) == sorted(
+                set(adj.upper() for adj in game.map.abut_list(loc))
+            )
+        neighbors = graph.neighbors_mask(graph.mask(["PAR", "MUN"]))
+        assert graph.names(neighbors & graph.mask(["BUR", "KIE", "LON"])) == [
+            "BUR",
+            "KIE",
+        ]
+
+    def test_neighborhoods(self):
+        graph = ProvinceGraph(ADJACENCY, TYPES)
+        # The table is only built when requested, then reused
+        assert graph._neighborhoods is None
+        one_hop = graph.neighborhoods()
+        assert graph.neighborhoods() is one_hop
+
+        assert one_hop["SWE"] == frozenset(ADJACENCY["SWE"])
+        assert graph.province_of["STP/NC"] == "STP"
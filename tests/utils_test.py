@@ -1,18 +1,40 @@
+import asyncio
+import gc
 from typing import Dict, List
+import weakref
 
 from diplomacy import Game, Message
 import pytest
 
 from baseline_bots.parsing_utils import (
+    ORDER_TRANSLATION_CACHE,
+    OrderTranslationCache,
     daide_to_dipnet_parsing,
     dipnet_to_daide_parsing,
     parse_proposal_messages,
 )
+import baseline_bots.utils
 from baseline_bots.utils import (
+    MESSAGE_GRAMMAR,
+    DAIDEParseCache,
+    MessagesData,
     OrdersData,
+    ParsedOrder,
+    RolloutCache,
+    evaluate_proposals,
+    get_all_possible_orders,
+    get_game_forker,
+    get_grammar,
     get_order_tokens,
+    get_orderable_locations,
+    get_possible_orders_set,
+    get_support_index,
+    get_unit_power_index,
+    iter_sub_arrangements,
     parse_arrangement,
     parse_daide,
+    parse_order,
+    prevalidate_daide_message,
     smart_select_support_proposals,
 )
 
@@ -32,6 +54,62 @@ class TestUtils:
         orders_data.add_order(EXAMPLE_ORDER_2)
         assert list(orders_data) == ["A VIE H"]
 
+    def test_orders_data(self):
+        orders_data = OrdersData()
+        orders_data.add_orders(["A PAR H", "F STP/SC R BOT", "A MAR - BUR"])
+        assert list(orders_data) == ["A MAR - BUR", "A PAR H", "F STP/SC R BOT"]
+        assert orders_data.orders["STP/SC"] == "F STP/SC R BOT"
+        assert "BUR" not in orders_data.orders
+
+        previous_orders = orders_data.copy()
+        orders = ["A PAR - BUR", "A MUN H"]
+        orders_data.add_orders(orders, [parse_order(order) for order in orders])
+        assert list(orders_data) == [
+            "A MAR - BUR",
+            "A MUN H",
+            "A PAR - BUR",
+            "F STP/SC R BOT",
+        ]
+        assert orders_data.diff(previous_orders) == {
+            "PAR": ("A PAR H", "A PAR - BUR"),
+            "MUN": (None, "A MUN H"),
+        }
+        assert previous_orders.diff(previous_orders.copy()) == {}
+
+        # Parsed orders must match the orders one to one
+        with pytest.raises(ValueError):
+            orders_data.add_orders(orders, [parse_order(orders[0])])
+        assert len(previous_orders) == 3
+
+    def test_messages_data(self):
+        FCT_MESSAGE = "FCT (XDO ((RUS FLT BLA) MTO CON))"
+        PRP_MESSAGE = "PRP (XDO ((RUS FLT BLA) MTO CON))"
+
+        msg_data = MessagesData()
+        assert not msg_data.add_message("TURKEY", FCT_MESSAGE)
+        assert not msg_data.add_message("TURKEY", PRP_MESSAGE)
+        assert not msg_data.add_message("AUSTRIA", PRP_MESSAGE)
+
+        # Duplicates are reported, and only added if allowed
+        assert msg_data.add_message("TURKEY", FCT_MESSAGE, allow_duplicates=False)
+        assert len(msg_data) == 3
+        assert msg_data.add_message("TURKEY", FCT_MESSAGE)
+        assert len(msg_data) == 4
+
+        assert {"recipient": "AUSTRIA", "message": PRP_MESSAGE} in msg_data
+        assert {"recipient": "AUSTRIA", "message": FCT_MESSAGE} not in msg_data
+        assert msg_data.has_message("TURKEY", "FCT")
+        assert not msg_data.has_message("AUSTRIA", "FCT")
+        assert not msg_data.has_message("ENGLAND")
+        assert msg_data.get_messages(keyword="PRP") == [
+            {"recipient": "TURKEY", "message": PRP_MESSAGE},
+            {"recipient": "AUSTRIA", "message": PRP_MESSAGE},
+        ]
+        assert msg_data.get_messages("AUSTRIA") == [
+            {"recipient": "AUSTRIA", "message": PRP_MESSAGE}
+        ]
+        assert list(msg_data) == msg_data.messages
+
     DIPNET_TO_DAIDE_PARSING_TEST_CASES = [
         (["A PAR H"], ["( FRA AMY PAR ) HLD"], False),
         (["F STP/SC H"], ["( RUS FLT (STP SCS) ) HLD"], False),
@@ -157,6 +235,41 @@ class TestUtils:
                 tc_ip_ord.replace(" R ", " - "),
             )
 
+    def test_order_translation_cache(self):
+        game = Game()
+        # Forget translations and counts left by other tests
+        ORDER_TRANSLATION_CACHE.start_phase("")
+        ORDER_TRANSLATION_CACHE.start_phase(game.get_current_phase())
+        initial_stats = ORDER_TRANSLATION_CACHE.stats()
+        assert initial_stats == {"hits": 0, "misses": 0, "size": 0}
+
+        (command,) = dipnet_to_daide_parsing(["A PAR S A MAR - BUR"], game)
+        assert str(command) == "( FRA AMY PAR ) SUP ( FRA AMY MAR ) MTO BUR"
+        assert ORDER_TRANSLATION_CACHE.stats()["misses"] == 1
+
+        # Repeated translations in both directions are served from the cache
+        assert dipnet_to_daide_parsing(["A PAR S A MAR - BUR"], game) == [command]
+        assert ORDER_TRANSLATION_CACHE.stats()["hits"] == 1
+        assert daide_to_dipnet_parsing(command) == ("A PAR S A MAR - BUR", "FRA")
+        assert daide_to_dipnet_parsing(command) == ("A PAR S A MAR - BUR", "FRA")
+        assert ORDER_TRANSLATION_CACHE.stats()["hits"] == 2
+
+        # The same order with a unit owned by another power is translated again
+        game.set_units("GERMANY", ["A MAR"])
+        (command,) = dipnet_to_daide_parsing(["A PAR S A MAR - BUR"], game)
+        assert str(command) == "( FRA AMY PAR ) SUP ( GER AMY MAR ) MTO BUR"
+
+    def test_order_translation_cache_bound(self):
+        cache = OrderTranslationCache(max_dipnet_entries=2)
+        cache.put_dipnet("( FRA AMY PAR ) HLD", ("A PAR H", "FRA"))
+        cache.put_dipnet("( FRA AMY MAR ) HLD", ("A MAR H", "FRA"))
+        assert cache.get_dipnet("( FRA AMY PAR ) HLD") == ("A PAR H", "FRA")
+        # The least recently used translation is evicted
+        cache.put_dipnet("( FRA FLT BRE ) HLD", ("F BRE H", "FRA"))
+        assert cache.get_dipnet("( FRA AMY MAR ) HLD") is None
+        assert cache.get_dipnet("( FRA AMY PAR ) HLD") == ("A PAR H", "FRA")
+        assert cache.stats()["size"] == 2
+
     PARSE_PROPOSAL_MESSAGES_TEST_CASES = [
         [
             "RUSSIA",
@@ -345,6 +458,15 @@ class TestUtils:
             expected,
         )
 
+    @pytest.mark.parametrize("test_input,expected", PARSE_ARRANGEMENT_TEST_CASES)
+    def test_iter_sub_arrangements(self, test_input: str, expected: List[str]):
+        sub_arrangements = list(
+            iter_sub_arrangements(parse_daide(test_input).arrangement)
+        )
+        assert [str(o) for o in sub_arrangements] == expected
+        # Subarrangements are the parsed objects themselves
+        assert [parse_daide(o) for o in expected] == sub_arrangements
+
     def test_smart_select_support_proposals(self):
         test_input = {
             "A BOH": [
@@ -386,3 +508,337 @@ class TestUtils:
     @pytest.mark.parametrize("test_input,expected", GET_ORDER_TOKENS_TEST_CASES)
     def test_get_order_tokens(self, test_input: str, expected: List[str]):
         assert get_order_tokens(test_input) == expected
+
+    PARSE_ORDER_TEST_CASES = [
+        [
+            "A PAR H",
+            ParsedOrder(("A PAR", "H"), "A PAR", "A", "PAR", "H", None, None, None),
+        ],
+        [
+            "F STP/SC R BOT",
+            ParsedOrder(
+                ("F STP/SC", "- BOT"), "F STP/SC", "F", "STP/SC", "-", None, None, "BOT"
+            ),
+        ],
+        [
+            "A PAR S A MAR - BUR",
+            ParsedOrder(
+                ("A PAR", "S", "A MAR", "- BUR"),
+                "A PAR",
+                "A",
+                "PAR",
+                "S",
+                "A MAR",
+                "MAR",
+                "BUR",
+            ),
+        ],
+        [
+            "F ION C A TUN - GRE",
+            ParsedOrder(
+                ("F ION", "C", "A TUN", "- GRE"),
+                "F ION",
+                "F",
+                "ION",
+                "C",
+                "A TUN",
+                "TUN",
+                "GRE",
+            ),
+        ],
+        ["WAIVE", ParsedOrder(("WAIVE",), "WAIVE", "", "WAIVE", "", None, None, None)],
+    ]
+
+    @pytest.mark.parametrize("test_input,expected", PARSE_ORDER_TEST_CASES)
+    def test_parse_order(self, test_input: str, expected: ParsedOrder):
+        assert parse_order(test_input) == expected
+
+    def test_get_grammar(self):
+        # Grammars are built once, on first access
+        assert get_grammar("MESSAGE_GRAMMAR") is MESSAGE_GRAMMAR
+        assert get_grammar("MESSAGE_GRAMMAR") is get_grammar("MESSAGE_GRAMMAR")
+        with pytest.raises(AttributeError):
+            baseline_bots.utils.UNKNOWN_GRAMMAR
+
+    def test_grammar_cache(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(baseline_bots.utils, "GRAMMAR_CACHE_DIR", str(tmp_path))
+        path = baseline_bots.utils._get_grammar_cache_path("LIMITED_MESSAGE_GRAMMAR")
+
+        # Unreadable cached grammars are rebuilt and replaced
+        with open(path, "wb") as file:
+            file.write(b"not a pickle")
+        grammar = baseline_bots.utils._load_or_build_grammar("LIMITED_MESSAGE_GRAMMAR")
+        assert grammar.parse("PRP (PCE (RUS TUR))")
+        cached_grammar = baseline_bots.utils._load_or_build_grammar(
+            "LIMITED_MESSAGE_GRAMMAR"
+        )
+        assert cached_grammar.parse("PRP (PCE (RUS TUR))")
+
+        # Upgrading daidepp or parsimonious invalidates cached grammars
+        monkeypatch.setattr(
+            baseline_bots.utils, "_get_package_version", lambda package: "0.0.0"
+        )
+        assert (
+            baseline_bots.utils._get_grammar_cache_path("LIMITED_MESSAGE_GRAMMAR")
+            != path
+        )
+
+    def test_daide_parse_cache(self):
+        cache = DAIDEParseCache(maxsize=2)
+        message = "PRP (XDO ((RUS FLT BLA) MTO CON))"
+
+        is_valid, parsed = cache.parse(message, MESSAGE_GRAMMAR)
+        assert is_valid
+        assert str(parsed) == "PRP ( XDO ( ( RUS FLT BLA ) MTO CON ) )"
+        assert cache.stats()["misses"] == 1
+
+        # Repeated parses are served from the cache
+        assert cache.parse(message, MESSAGE_GRAMMAR) == (True, parsed)
+        assert cache.stats()["hits"] == 1
+
+        # Invalid strings are cached too
+        assert cache.parse("PRP (XDO", MESSAGE_GRAMMAR) == (False, None)
+        assert cache.parse("PRP (XDO", MESSAGE_GRAMMAR) == (False, None)
+        assert cache.stats()["hits"] == 2
+
+        # Least recently used entries are evicted
+        cache.parse("YES (PRP (PCE (RUS TUR)))", MESSAGE_GRAMMAR)
+        assert len(cache) == 2
+        cache.parse(message, MESSAGE_GRAMMAR)
+        assert cache.stats()["misses"] == 4
+
+    def test_daide_parse_cache_grammar_identity(self):
+        class Grammar(dict):
+            def parse(self, string):
+                raise ValueError("Not DAIDE")
+
+        cache = DAIDEParseCache()
+        grammar = Grammar()
+        assert cache.parse("YES", grammar) == (False, None)
+        grammar_id = id(grammar)
+        assert grammar_id in baseline_bots.utils._GRAMMAR_VOCABULARIES
+
+        # Entries left by another grammar with the same id() are not reused
+        other_grammar = Grammar()
+        cache._entries[(grammar_id, "REJ")] = (weakref.ref(other_grammar), True, "")
+        assert cache.parse("REJ", grammar) == (False, None)
+
+        # Vocabularies are dropped with their grammar
+        del grammar
+        gc.collect()
+        assert grammar_id not in baseline_bots.utils._GRAMMAR_VOCABULARIES
+
+    def test_parse_daide_error(self):
+        with pytest.raises(ValueError) as excinfo:
+            parse_daide("PRP (XDO")
+        # The parser's error is kept, even when the invalid result comes from the cache
+        assert excinfo.value.__cause__ is not None
+        with pytest.raises(ValueError) as excinfo:
+            parse_daide("PRP (XDO")
+        assert excinfo.value.__cause__ is not None
+
+    def test_prevalidate_daide_message(self):
+        message = "PRP (XDO ((RUS FLT BLA) MTO CON))"
+        assert prevalidate_daide_message(message)
+        # Unbalanced parentheses
+        assert not prevalidate_daide_message("PRP (XDO ((RUS FLT BLA) MTO CON)")
+        assert not prevalidate_daide_message("PRP (XDO ((RUS FLT BLA) MTO CON)))")
+        # Unknown token
+        assert not prevalidate_daide_message("PRP (XDO ((RUS FLT XYZZY) MTO CON))")
+        # Tokens need not be separated by whitespace
+        assert prevalidate_daide_message("PRP(XDO((RUS FLT BLA)MTO CON))")
+
+    def test_get_game_forker(self):
+        class Bot:
+            game = Game()
+            game_forker = None
+
+        bot = Bot()
+        forker = get_game_forker(bot)
+        assert bot.game_forker is forker
+        # The base copy is reused while the position is unchanged
+        assert get_game_forker(bot) is forker
+        fork = forker.fork()
+        fork.process()
+        assert forker.is_current(bot.game)
+
+        bot.game.process()
+        new_forker = get_game_forker(bot)
+        assert new_forker is not forker
+        assert new_forker.base.get_current_phase() == "F1901M"
+
+    def test_rollout_cache(self):
+        game = Game()
+        cache = RolloutCache()
+        cache.start_phase(game.get_current_phase())
+        rollouts = []
+
+        async def rollout() -> float:
+            rollouts.append(None)
+            await asyncio.sleep(0)
+            return 1.0
+
+        # Keys do not depend on the order of powers or orders
+        key = RolloutCache.make_key(
+            game, {"FRANCE": ["A PAR H", "F BRE H"], "ENGLAND": ["F LON H"]}
+        )
+        same_key = RolloutCache.make_key(
+            game, {"ENGLAND": ["F LON H"], "FRANCE": ["F BRE H", "A PAR H"]}
+        )
+        assert key == same_key
+
+        async def evaluate():
+            return await asyncio.gather(
+                cache.get_value(key, rollout), cache.get_value(same_key, rollout)
+            )
+
+        # Concurrent duplicates share a single rollout
+        assert asyncio.run(evaluate()) == [1.0, 1.0]
+        assert len(rollouts) == 1
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+        # A new phase starts with an empty cache
+        cache.start_phase("F1901M")
+        assert cache.stats() == {"hits": 0, "misses": 0, "size": 0}
+
+    def test_evaluate_proposals_successive_halving(self, monkeypatch):
+        values = {"ENGLAND": 5.0, "FRANCE": 4.0, "GERMANY": 1.0, "ITALY": 2.0}
+        samples = []
+
+        async def simulate_proposal(bot, unit_orders, shared_order, forker, sample):
+            (proposer,) = unit_orders
+            samples.append(proposer)
+            # alternate around the mean so every proposal has some variance
+            return values[proposer] + (-0.1 if sample % 2 else 0.1)
+
+        monkeypatch.setattr("baseline_bots.utils.simulate_proposal", simulate_proposal)
+
+        class Bot:
+            game = Game()
+            rollout_n_samples = 8
+
+        proposals = {power: [power] for power in values}
+        proposals["TURKEY"] = []
+        evaluations = asyncio.run(evaluate_proposals(Bot(), proposals, {}))
+
+        # proposals without orders are not evaluated
+        assert sorted(evaluations) == sorted(values)
+        for proposer, evaluation in evaluations.items():
+            assert evaluation.value == pytest.approx(values[proposer])
+        # every proposal gets two samples and the better half four more,
+        # after which ENGLAND clearly dominates
+        assert evaluations["GERMANY"].n_samples == 2
+        assert evaluations["ITALY"].n_samples == 2
+        assert evaluations["ENGLAND"].n_samples == 6
+        assert evaluations["FRANCE"].n_samples == 6
+        lower, upper = evaluations["ENGLAND"].confidence_interval()
+        assert lower < 5.0 < upper
+        assert len(samples) == 16
+
+    def test_evaluate_proposals_deadline(self, monkeypatch):
+        values = {"ENGLAND": 5.0, "FRANCE": 4.9, "GERMANY": 1.0, "ITALY": 2.0}
+
+        async def simulate_proposal(bot, unit_orders, shared_order, forker, sample):
+            (proposer,) = unit_orders
+            await asyncio.sleep(0.2)
+            return values[proposer] + (-1.0 if sample % 2 else 1.0)
+
+        monkeypatch.setattr("baseline_bots.utils.simulate_proposal", simulate_proposal)
+
+        class Bot:
+            game = Game()
+
+        async def evaluate():
+            loop = asyncio.get_event_loop()
+            start_time = loop.time()
+            # the second round of rollouts is still running at the deadline
+            evaluations = await evaluate_proposals(
+                Bot(),
+                {power: [power] for power in values},
+                {},
+                deadline=start_time + 0.3,
+            )
+            return evaluations, loop.time() - start_time
+
+        evaluations, elapsed = asyncio.run(evaluate())
+        assert elapsed < 0.4
+        # only the samples of the first round are kept
+        assert sorted(evaluations) == sorted(values)
+        for proposer, evaluation in evaluations.items():
+            assert evaluation.n_samples == 2
+            assert evaluation.value == pytest.approx(values[proposer])
+
+    def test_evaluate_proposals_deadline_keeps_sampling(self, monkeypatch):
+        values = {"ENGLAND": 5.0, "FRANCE": 4.9, "GERMANY": 1.0}
+
+        async def simulate_proposal(bot, unit_orders, shared_order, forker, sample):
+            (proposer,) = unit_orders
+            await asyncio.sleep(0.01)
+            return values[proposer] + (-3.0 if sample % 2 else 3.0)
+
+        monkeypatch.setattr("baseline_bots.utils.simulate_proposal", simulate_proposal)
+
+        class Bot:
+            game = Game()
+
+        async def evaluate():
+            loop = asyncio.get_event_loop()
+            start_time = loop.time()
+            evaluations = await evaluate_proposals(
+                Bot(),
+                {power: [power] for power in values},
+                {},
+                deadline=start_time + 0.3,
+            )
+            return evaluations, loop.time() - start_time
+
+        evaluations, elapsed = asyncio.run(evaluate())
+        # the two close finalists are sampled until the deadline
+        assert elapsed >= 0.25
+        assert evaluations["GERMANY"].n_samples == 2
+        assert evaluations["ENGLAND"].n_samples > 2
+        assert evaluations["ENGLAND"].n_samples == evaluations["FRANCE"].n_samples
+
+    def test_get_unit_power_index(self):
+        game = Game()
+        index = get_unit_power_index(game)
+        assert index["A PAR"] == "FRA"
+        assert index["F TRI"] == "AUS"
+        assert len(index) == 22
+        # The index is reused until the position changes
+        assert get_unit_power_index(game) is index
+
+        game.set_orders("FRANCE", ["A PAR - BUR"])
+        game.process()
+        new_index = get_unit_power_index(game)
+        assert new_index["A BUR"] == "FRA"
+        assert "A PAR" not in new_index
+
+    def test_possible_orders_cache(self):
+        game = Game()
+        all_possible_orders = get_all_possible_orders(game)
+        assert all_possible_orders == game.get_all_possible_orders()
+        assert get_all_possible_orders(game) is all_possible_orders
+        assert get_orderable_locations(game, "FRANCE") == ["BRE", "MAR", "PAR"]
+
+        possible_orders = get_possible_orders_set(game, "FRANCE")
+        assert "A PAR - BUR" in possible_orders
+        assert "A MUN - BUR" not in possible_orders
+        assert get_possible_orders_set(game, "FRANCE") is possible_orders
+
+        game.set_orders("FRANCE", ["A PAR - BUR"])
+        game.process()
+        assert get_orderable_locations(game, "FRANCE") == ["BRE", "BUR", "MAR"]
+        assert "A BUR - MUN" in get_possible_orders_set(game, "FRANCE")
+
+    def test_get_support_index(self):
+        game = Game()
+        index = get_support_index(game)
+        assert sorted(index["A MUN - BUR"]) == [
+            ("MAR", "A MAR S A MUN - BUR"),
+            ("PAR", "A PAR S A MUN - BUR"),
+        ]
+        # Support holds are keyed by the supported unit
+        assert ("BUD", "A BUD S F TRI") in index["F TRI"]
+        assert "A MUN - RUH" not in index
+        assert get_support_index(game) is index